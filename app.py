@@ -1,42 +1,355 @@
 import uvicorn
-from fastapi import FastAPI,Request
-from src.graphs.graph_builder import GraphBuilder
-from src.llms.groqllm import GroqLLM
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import math
+import tempfile
+import time
+from fastapi import FastAPI,Request,HTTPException
+from fastapi.responses import StreamingResponse,Response,JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST,CollectorRegistry,generate_latest,multiprocess
+from src.graphs.registry import GraphRegistry,graph_inputs
+from src.batch.runner import BatchRunner,parse_jsonl
+from src.monitoring.instrumentation import trace_request,instrument_node
+from src.graphs.streaming import sse,stream_blog_events
+from src.graphs.checkpointing import open_checkpointer,ainvoke_resumable,discard_thread,sweep_periodically,RequestConflict
+from src.jobs.queue import JobQueue
+from src.cache.single_flight import SingleFlight
+from src.store.blog_store import BlogStore
+from src.states.blogstate import Blog
+from src.nodes.blog_node import find_section
+from src.jobs.worker import WorkerPool
+from src.serving.admission import AdmissionController,Rejected
+from src.llms.throttling import DeadlineExceeded,current_deadline,deadline_scope
 import os
+import logging
 from dotenv import load_dotenv
 load_dotenv()
+## prompt-budget decisions and other pipeline events are logged at INFO
+logging.basicConfig(level=os.getenv("LOG_LEVEL","INFO"),format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger=logging.getLogger(__name__)
 
-app=FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ## graphs checkpoint every completed node so retries resume instead of restarting
+    async with open_checkpointer() as checkpointer:
+        ## build the llm client and compiled graphs once per process
+        app.state.registry=GraphRegistry(use_async=True,checkpointer=checkpointer).startup()
+        ## bounded slots, queue and per-client quotas for generations on this worker
+        app.state.admission=AdmissionController.from_env()
+        app.state.inflight=SingleFlight("request")
+        ## every generated blog is kept in the blog store (BLOG_STORE=off to disable)
+        app.state.store=BlogStore.from_env()
+        ## long generations go through the job queue to a pool of worker processes
+        app.state.jobs=JobQueue()
+        app.state.workers=WorkerPool().start()
+        ## threads of runs that were never retried or stored expire after BLOG_CHECKPOINT_TTL
+        sweeper=asyncio.create_task(sweep_periodically(checkpointer)) if checkpointer is not None else None
+        try:
+            yield
+        finally:
+            if sweeper is not None:
+                sweeper.cancel()
+            app.state.workers.stop()
 
-os.environ['LANGCHAIN_API_KEY']=os.getenv('LANGCHAIN_API_KEY')
+app=FastAPI(lifespan=lifespan)
+
+if os.getenv('LANGCHAIN_API_KEY'):
+    os.environ['LANGCHAIN_API_KEY']=os.getenv('LANGCHAIN_API_KEY')
+
+@app.exception_handler(Rejected)
+async def rejected(request:Request,exc:Rejected):
+    ## fail fast under overload; the client knows when to come back
+    return JSONResponse({'detail':exc.reason},status_code=exc.status,headers={'Retry-After':str(exc.retry_after)})
+
+@app.exception_handler(RequestConflict)
+async def request_conflict(request:Request,exc:RequestConflict):
+    return JSONResponse({'detail':str(exc)},status_code=409)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request:Request,exc:DeadlineExceeded):
+    return JSONResponse({'detail':f"Deadline exceeded: {exc}"},status_code=504)
 
 ##API
 
+def client_id(request:Request):
+    """Who a request counts against for per-client quotas."""
+    return request.headers.get('X-Client-Id') or (request.client.host if request.client else 'unknown')
+
+def request_deadline(request:Request,data:dict):
+    """
+    Absolute deadline (time.monotonic()) from the X-Request-Timeout header or a
+    'timeout' field in seconds, else REQUEST_DEADLINE_SECONDS. No LLM call is
+    started for a request that cannot finish before it.
+    """
+    timeout=request.headers.get('X-Request-Timeout')
+    if timeout is None:
+        timeout=data.get('timeout')
+    if timeout is None:
+        timeout=os.getenv('REQUEST_DEADLINE_SECONDS','55')
+    try:
+        seconds=float(timeout)
+    except (TypeError,ValueError):
+        seconds=math.nan
+    if isinstance(timeout,bool) or not math.isfinite(seconds) or seconds<=0:
+        raise HTTPException(status_code=400,detail="Request timeout must be a positive number of seconds")
+    return time.monotonic()+seconds
+
+def request_inputs(data:dict):
+    """Graph variant and initial state for a request body; 400 when it has no usable topic."""
+    try:
+        return graph_inputs(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=str(e))
+
+def coalescing_key(usecase,inputs,request_id=None):
+    """
+    Key under which concurrent /blogs requests share one run. The request id is
+    part of it, as the run is checkpointed and stored under that id.
+    """
+    return json.dumps([usecase,inputs,request_id],sort_keys=True)
+
+async def save_blogs(app,state,request_id=None):
+    """Save the structured blogs of a finished run; returns {language: id}."""
+    if app.state.store is None:
+        return {}
+    stored=await asyncio.to_thread(app.state.store.save_state,state,app.state.registry.model_name,request_id)
+    if stored and request_id is not None:
+        ## the store now answers retries, so the checkpoint thread is no longer needed
+        await discard_thread(app.state.registry.checkpointer,request_id)
+    return stored
+
+def stored_state(app,inputs):
+    """Lookup for runs whose thread was dropped after their blogs were stored."""
+    if app.state.store is None:
+        return None
+    async def lookup(request_id):
+        return await asyncio.to_thread(app.state.store.load_state,request_id,inputs.get('languages'))
+    return lookup
+
 @app.post('/blogs')
 async def create_blogs(request:Request):
     data=await request.json()
-    topic=data.get("topic","")
-    language= data.get('language','')
+    usecase,inputs=request_inputs(data)
+    ## a client-supplied id lets a retry resume from the last completed node
+    request_id=data.get('request_id') or request.headers.get('Idempotency-Key')
+    deadline=request_deadline(request,data)
+
+    ##get graph from the shared registry
+    graph=request.app.state.registry.get_graph(usecase=usecase)
+
+    async def generate():
+        ## runs as shared work: queue against the latest deadline of the requests waiting on it
+        async with request.app.state.admission.slot(current_deadline()) as queued:
+            trace.queue=queued
+            state,status=await ainvoke_resumable(graph,inputs,request_id,lookup=stored_state(request.app,inputs))
+        ## keep the result so it can be fetched again instead of regenerated
+        stored=await save_blogs(request.app,state,request_id)
+        return state,status,stored
+
+    with trace_request('/blogs') as trace,deadline_scope(deadline):
+        async with request.app.state.admission.client(client_id(request)):
+            ## identical requests already in flight attach to that run instead of starting their own
+            state,status,stored=await request.app.state.inflight.ado(coalescing_key(usecase,inputs,request_id),generate)
+
+    return {'data':state,'status':status,'stored':stored,'timings':trace.summary()}
+
+@app.post('/blogs/stream')
+async def stream_blogs(request:Request):
+    """Server-sent events: the title first, then content tokens, then the blog."""
+    data=await request.json()
+    usecase,inputs=request_inputs(data)
+    request_id=data.get('request_id') or request.headers.get('Idempotency-Key')
+    graph=request.app.state.registry.get_graph(usecase=usecase)
+    deadline=request_deadline(request,data)
+    admission,client=request.app.state.admission,client_id(request)
+    ## rejected with 429/503 before the stream starts; the slot itself is only taken
+    ## once the body is read, so a response that is never sent holds nothing
+    admission.check(client,deadline)
 
-    ##get llm
-    groqllm=GroqLLM()
-    llm=groqllm.get_llm()
+    async def events():
+        try:
+            async with admission.client(client),admission.slot(deadline):
+                with deadline_scope(deadline):
+                    async for event,payload in stream_blog_events(graph,inputs,request_id,lookup=stored_state(request.app,inputs)):
+                        if event=="blog":
+                            payload={**payload,'stored':await save_blogs(request.app,payload,request_id)}
+                        yield sse(event,payload)
+        ## the 200 headers are already sent, so failures are reported as an error event
+        except Rejected as e:
+            ## capacity ran out between the check and the first read
+            yield sse("error",{'status':e.status,'detail':e.reason,'retry_after':e.retry_after})
+        except DeadlineExceeded as e:
+            yield sse("error",{'status':504,'detail':f"Deadline exceeded: {e}"})
+        except RequestConflict as e:
+            yield sse("error",{'status':409,'detail':str(e)})
+        except Exception:
+            logger.exception("streamed generation failed")
+            yield sse("error",{'status':500,'detail':"Blog generation failed"})
 
-    ##get graph
+    return StreamingResponse(events(),media_type="text/event-stream",headers={"Cache-Control":"no-cache"})
+
+@app.post('/blogs/batch')
+async def batch_blogs(request:Request,concurrency:int=8):
+    """
+    Batch generation: the body is JSONL of {id?, topic, language} records and the
+    response streams one JSON result per line as each generation finishes.
+    Resubmit only the records missing from a partial response to resume.
+    """
+    ## a batch may hold only a share of the generation slots, so interactive requests still get in
+    admission=request.app.state.admission
+    share=max(1,int(admission.max_active*float(os.getenv("BATCH_SLOT_SHARE","0.25"))))
+    max_concurrency=min(int(os.getenv("BATCH_MAX_CONCURRENCY","64")),share)
+    if not 1<=concurrency<=max_concurrency:
+        raise HTTPException(status_code=400,detail=f"concurrency must be between 1 and {max_concurrency}")
+    ## spool the body first: the streamed response shares the receive channel,
+    ## so the request cannot still be read once results start flowing
+    body=tempfile.SpooledTemporaryFile(max_size=1<<20)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+
+    def records():
+        with body:
+            yield from parse_jsonl(body)
+
+    runner=BatchRunner(request.app.state.registry,concurrency=concurrency,admission=admission,store=request.app.state.store)
+
+    async def results():
+        async for result in runner.run(records()):
+            yield json.dumps(result,ensure_ascii=False)+"\n"
+
+    return StreamingResponse(results(),media_type="application/x-ndjson")
+
+@app.get('/blogs')
+async def list_blogs(request:Request,topic:str|None=None,language:str|None=None,model:str|None=None,
+                     q:str|None=None,limit:int=50,cursor:str|None=None):
+    """
+    Stored blogs, newest first, filtered by topic/language/model; pass the returned
+    next_cursor to get the next page. With q, a full-text search over section
+    content instead, best match first. Rows are streamed as they are read.
+    """
+    store=request.app.state.store
+    if store is None:
+        raise HTTPException(status_code=404,detail="Blog store is disabled")
+    limit=max(1,min(limit,500))
+    try:
+        rows=store.search(q,limit=limit) if q else store.iter_blogs(topic,language,model,before=cursor,limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400,detail="Invalid cursor")
+
+    def body():
+        yield '{"items":['
+        last,count=None,0
+        for row in rows:
+            yield (',' if count else '')+json.dumps(row,ensure_ascii=False)
+            last,count=row,count+1
+        next_cursor=last['cursor'] if last and count==limit and not q else None
+        yield '],"next_cursor":'+json.dumps(next_cursor)+'}'
+
+    return StreamingResponse(body(),media_type="application/json")
+
+@app.get('/blogs/{blog_id}')
+async def get_blog(blog_id:str,request:Request):
+    store=request.app.state.store
+    record=await asyncio.to_thread(store.get,blog_id) if store is not None else None
+    if record is None:
+        raise HTTPException(status_code=404,detail="Blog not found")
+    return record
+
+@app.post('/blogs/sections/regenerate')
+async def regenerate_section(request:Request):
+    """
+    Rewrite one section of an existing blog with one small LLM call, its neighbours
+    as context. Body: {"blog": Blog} or {"blog_id": stored id}, plus "index" or
+    "title", optional "language" and "instructions". A stored blog is updated in place.
+    """
+    data=await request.json()
+    store=request.app.state.store
+    blog,language=data.get('blog'),data.get('language','english')
+    if data.get('blog_id'):
+        record=await asyncio.to_thread(store.get,data['blog_id']) if store is not None else None
+        if record is None:
+            raise HTTPException(status_code=404,detail="Blog not found")
+        blog,language=record['blog'],record['language']
+    try:
+        blog=Blog.model_validate(blog)
+        position=find_section(blog,data.get('index'),data.get('title'))
+    except (IndexError,KeyError,ValueError) as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    if not isinstance(language,str) or not language.strip():
+        raise HTTPException(status_code=400,detail="'language' must be a non-empty string")
+    if not isinstance(data.get('instructions'),(str,type(None))):
+        raise HTTPException(status_code=400,detail="'instructions' must be a string")
+
+    node=request.app.state.registry.get_node()
+    regenerate=instrument_node("regenerate_section",node.aregenerate_section)
+    state={'blog':blog,'section_index':position,'current_language':language,'instructions':data.get('instructions')}
+    deadline=request_deadline(request,data)
+    with trace_request('/blogs/sections/regenerate') as trace,deadline_scope(deadline):
+        async with await request.app.state.admission.admit(client_id(request),deadline):
+            result=await regenerate(state)
+
+    if data.get('blog_id'):
+        await asyncio.to_thread(store.replace_section,data['blog_id'],position,result['blog']['sections'][position])
+    return {'blog':result['blog'],'index':position,'timings':trace.summary()}
+
+@app.post('/jobs',status_code=202)
+async def submit_job(request:Request):
+    """Queue a generation and return its id at once; poll GET /jobs/{id} for the blog."""
+    data=await request.json()
+    ## rejected here rather than failing later in a worker
+    request_inputs(data)
+    priority=data.pop('priority',0)
+    if isinstance(priority,str) and priority.strip().lstrip('-').isdigit():
+        priority=int(priority)
+    if isinstance(priority,bool) or not isinstance(priority,int):
+        raise HTTPException(status_code=400,detail="priority must be an integer")
+    ## the queue is shared with the worker processes; its writes can wait on their locks
+    job_id=await asyncio.to_thread(request.app.state.jobs.submit,data,priority=priority)
+    return {'id':job_id,'status':'queued'}
 
-    graph_builder=GraphBuilder(llm)
-    if topic and language:
-        graph=graph_builder.setup_graph(usecase='language')
-        state=graph.invoke({'topic':topic,"current_language":language.lower()})
+@app.get('/jobs/{job_id}')
+async def get_job(job_id:str,request:Request):
+    job=await asyncio.to_thread(request.app.state.jobs.get,job_id)
+    if job is None:
+        raise HTTPException(status_code=404,detail="Job not found")
+    return job
 
-    elif topic:
-        graph=graph_builder.setup_graph(usecase='topic')
-        state=graph.invoke({'topic':topic})
+@app.delete('/jobs/{job_id}')
+async def cancel_job(job_id:str,request:Request):
+    status=await asyncio.to_thread(request.app.state.jobs.cancel,job_id)
+    if status is None:
+        raise HTTPException(status_code=404,detail="Job not found")
+    return {'id':job_id,'status':status}
 
+@app.get('/metrics')
+async def metrics():
+    """Prometheus exposition of per-node latency, token and cost metrics."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        ## several server workers: merge what every process recorded
+        registry=CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry),media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(),media_type=CONTENT_TYPE_LATEST)
 
-    return {'data':state}
+@app.get('/stats')
+async def stats(request:Request):
+    state=request.app.state
+    ## both read shared SQLite files; the store one scans every section
+    jobs=await asyncio.to_thread(state.jobs.stats)
+    store=await asyncio.to_thread(state.store.stats) if state.store is not None else None
+    return {
+        'registry':state.registry.stats(),
+        'requests_coalesced':state.inflight.stats(),
+        'admission':state.admission.stats(),
+        'jobs':jobs,
+        'job_workers':state.workers.alive(),
+        'store':store,
+    }
 
 if __name__=="__main__":
+    ## development server; `python main.py serve` runs the multi-worker production mode
     uvicorn.run("app:app",host="0.0.0.0",port=8000,reload=True)
 
 
@@ -0,0 +1,163 @@
+"""
+Load test for the multi-worker serving mode (``python main.py serve``).
+
+For each worker count the script starts the server with the offline fake
+model, sends unique POST /blogs requests from ``--clients`` load-generator
+processes and reports throughput and latency. With a fake model that answers
+instantly, the time left is the server's own CPU work (JSON, pydantic
+validation, prompt rendering, graph orchestration), so throughput should grow
+with workers up to the number of cores; raise --latency to see the I/O-bound
+regime instead.
+
+    python benchmarks/load_test.py --workers 1,2,4 --concurrency 64 --requests 512
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLUMNS = ("workers", "concurrency", "requests", "errors", "p50_ms", "p95_ms", "throughput_rps", "speedup")
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def server_environment(args, state_dir):
+    return {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        # Unique topics already defeat the caches; keep them out of the way entirely.
+        "BLOG_SEMANTIC_CACHE": "off",
+        "BLOG_STORE": "off",
+        "JOB_WORKERS": "0",
+        "BLOG_CACHE_DB": os.path.join(state_dir, "response_cache.sqlite"),
+        "LLM_RATE_LIMIT_DB": os.path.join(state_dir, "ratelimit.sqlite"),
+        "JOB_QUEUE_DB": os.path.join(state_dir, "jobs.sqlite"),
+        "BLOG_CHECKPOINT_DB": os.path.join(state_dir, "checkpoints.sqlite"),
+        "LOG_LEVEL": "WARNING",
+    }
+
+def start_server(args, workers, state_dir):
+    server = subprocess.Popen(
+        [sys.executable, "main.py", "serve", "--workers", str(workers), "--port", str(args.port)],
+        cwd=ROOT, env=server_environment(args, state_dir),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server with {workers} workers exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/stats", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(server)
+    raise SystemExit(f"Server with {workers} workers did not start within 60s")
+
+def stop_server(server):
+    os.killpg(server.pid, signal.SIGINT)
+    try:
+        server.wait(timeout=20)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+async def drive(port, client, requests, concurrency):
+    """Send ``requests`` unique generations with ``concurrency`` in flight; returns latencies and errors."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300) as http:
+        async def one(number):
+            nonlocal errors
+            body = {"topic": f"load test topic {client}-{number}-{time.time_ns()}", "language": "german"}
+            async with slots:
+                started = time.perf_counter()
+                response = await http.post("/blogs", json=body)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        await asyncio.gather(*(one(number) for number in range(requests)))
+    return latencies, errors
+
+def run_client(job):
+    port, client, requests, concurrency = job
+    return asyncio.run(drive(port, client, requests, concurrency))
+
+def measure(args, pool, requests):
+    """Split the load across the client processes and merge their results."""
+    jobs = [
+        (args.port, client, requests // args.clients, max(1, args.concurrency // args.clients))
+        for client in range(args.clients)
+    ]
+    started = time.perf_counter()
+    results = pool.map(run_client, jobs)
+    elapsed = time.perf_counter() - started
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    return latencies, sum(errors for _, errors in results), elapsed
+
+def print_row(row):
+    print("  ".join(f"{row[column]!s:>14}" for column in COLUMNS), flush=True)
+
+def int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int_list, default=[w for w in (1, 2, 4, 8, 16) if w <= cores] or [1])
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight across all clients")
+    parser.add_argument("--requests", type=int, default=512, help="Requests per worker count")
+    parser.add_argument("--warmup", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=max(1, min(4, cores // 4)), help="Load-generator processes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=1e6, help="Fake generation speed")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.clients} load-generator processes")
+    print("  ".join(f"{column:>14}" for column in COLUMNS))
+    rows, baseline = [], None
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory(prefix="blog-load-") as state_dir:
+                server = start_server(args, workers, state_dir)
+                try:
+                    measure(args, pool, args.warmup)
+                    latencies, errors, elapsed = measure(args, pool, args.requests)
+                finally:
+                    stop_server(server)
+            throughput = len(latencies) / elapsed
+            baseline = baseline or throughput
+            rows.append({
+                "workers": workers,
+                "concurrency": args.concurrency,
+                "requests": len(latencies),
+                "errors": errors,
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "throughput_rps": round(throughput, 1),
+                "speedup": round(throughput / baseline, 2),
+            })
+            print_row(rows[-1])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
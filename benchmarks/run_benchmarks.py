@@ -0,0 +1,208 @@
+"""
+Offline benchmark for the blog graph and the FastAPI app.
+
+Every LLM call is served by the deterministic FakeChatModel, so runs need no
+network access or API key. For each scenario the script sweeps concurrency and
+draft size and reports p50/p95/p99 latency, throughput and peak RSS; the
+"baseline" scenario makes the same LLM calls without the graph, so the gap to
+"graph" is the orchestration overhead and the gap to "app" the serving overhead.
+
+With --failure-rate, LLM calls fail at that rate and each blog is retried
+under the same request id until it succeeds, once restarting from scratch
+and once resuming from checkpoints, to compare tokens spent per blog.
+
+    python benchmarks/run_benchmarks.py --concurrency 1,8,32 --sizes 200,800 --requests 64
+    python benchmarks/run_benchmarks.py --scenarios none --failure-rate 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_PROVIDER"] = "fake"
+# Benchmark topics differ only by a counter, so near-duplicate reuse would hide the work.
+os.environ.setdefault("BLOG_SEMANTIC_CACHE", "off")
+
+import httpx
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from src.graphs.checkpointing import ainvoke_resumable
+from src.graphs.graph_builder import GraphBuilder
+from src.llms.fakellm import FakeLLM
+from src.states.blogstate import Blog
+
+_run = itertools.count()
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def next_topic():
+    # Unique topics keep the response cache out of the measurement.
+    return f"benchmark topic {next(_run)}"
+
+async def drive(call, requests, concurrency):
+    """Run ``requests`` calls with at most ``concurrency`` in flight; return latencies and wall time."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with slots:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started
+
+def scenario_baseline(size):
+    llm = FakeLLM(content_tokens=size).get_llm()
+
+    async def call():
+        topic = next_topic()
+        _, draft = await asyncio.gather(
+            llm.ainvoke(f"Generate a creative and SEO-friendly blog title for the topic: {topic}."),
+            llm.ainvoke(f"Generate a detailed blog content with a breakdown for the topic: {topic}."),
+        )
+        await llm.with_structured_output(Blog).ainvoke([HumanMessage(content=draft.content)])
+
+    return call, None
+
+def scenario_graph(size):
+    graph = GraphBuilder(FakeLLM(content_tokens=size).get_llm()).setup_graph(use_async=True)
+
+    async def call():
+        await graph.ainvoke({"topic": next_topic(), "current_language": "english"})
+
+    return call, None
+
+def scenario_app(size):
+    os.environ["FAKE_LLM_CONTENT_TOKENS"] = str(size)
+    os.environ.setdefault("MAX_CONCURRENT_GENERATIONS", "1024")
+    # /blogs is measured in-process; the job workers would only compete for cores.
+    os.environ.setdefault("JOB_WORKERS", "0")
+    from app import app
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+    lifespan = app.router.lifespan_context(app)
+
+    async def call():
+        response = await client.post("/blogs", json={"topic": next_topic(), "language": "english"})
+        response.raise_for_status()
+
+    async def setup():
+        await lifespan.__aenter__()
+
+    async def teardown():
+        await client.aclose()
+        await lifespan.__aexit__(None, None, None)
+
+    return call, (setup, teardown)
+
+SCENARIOS = {"baseline": scenario_baseline, "graph": scenario_graph, "app": scenario_app}
+
+async def run(args):
+    rows = []
+    for name in args.scenarios:
+        for size, concurrency in itertools.product(args.sizes, args.concurrency):
+            call, hooks = SCENARIOS[name](size)
+            if hooks:
+                await hooks[0]()
+            try:
+                await drive(call, min(args.warmup, args.requests), concurrency)
+                latencies, wall = await drive(call, args.requests, concurrency)
+            finally:
+                if hooks:
+                    await hooks[1]()
+            rows.append({
+                "scenario": name,
+                "size": size,
+                "concurrency": concurrency,
+                "requests": args.requests,
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+                "throughput_rps": round(args.requests / wall, 2),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            })
+            print_row(rows[-1])
+    return rows
+
+async def run_resilience(args, size=400, max_attempts=20):
+    """Tokens per successful blog under injected failures, with and without checkpoints."""
+    rows = []
+    for mode in ("restart", "checkpoint"):
+        # Only token counts matter here, so calls are made instantaneous.
+        llm = FakeLLM(content_tokens=size, fail_rate=args.failure_rate, latency=0.0, tokens_per_second=1e9).get_llm()
+        checkpointer = InMemorySaver() if mode == "checkpoint" else None
+        graph = GraphBuilder(llm).setup_graph(use_async=True, checkpointer=checkpointer)
+        attempts = successes = 0
+        for i in range(args.requests):
+            for _ in range(max_attempts):
+                attempts += 1
+                try:
+                    await ainvoke_resumable(graph, {"topic": next_topic(), "current_language": "english"}, f"bench-{i}")
+                    successes += 1
+                    break
+                except Exception:
+                    continue
+        rows.append({
+            "mode": mode,
+            "failure_rate": args.failure_rate,
+            "blogs": successes,
+            "attempts": attempts,
+            "tokens_per_blog": round(llm.tokens_used / max(1, successes)),
+        })
+        print(f"{mode:>14}  failure_rate={args.failure_rate}  blogs={successes}  attempts={attempts}  "
+              f"tokens_per_blog={rows[-1]['tokens_per_blog']}", flush=True)
+    return rows
+
+COLUMNS = ("scenario", "size", "concurrency", "p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+
+def print_row(row):
+    print("  ".join(f"{row[column]!s:>14}" for column in COLUMNS), flush=True)
+
+def int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8, 32])
+    parser.add_argument("--sizes", type=int_list, default=[200, 800], help="Draft sizes in tokens")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per data point")
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--latency", type=float, help="Fake time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, help="Fake generation speed")
+    parser.add_argument("--failure-rate", type=float, help="Also compare restart vs. checkpoint resume at this LLM failure rate")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.latency is not None:
+        os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    if args.tokens_per_second is not None:
+        os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+
+    args.scenarios = [name for name in args.scenarios if name in SCENARIOS]
+    if args.scenarios:
+        print("  ".join(f"{column:>14}" for column in COLUMNS))
+    rows = asyncio.run(run(args))
+    if args.failure_rate:
+        rows += asyncio.run(run_resilience(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,75 @@
+import argparse
+import asyncio
+from src.batch.runner import BatchRunner
+from src.graphs.registry import GraphRegistry
+from src.graphs.checkpointing import open_checkpointer
+from src.jobs.worker import run_worker
+from src.store.blog_store import BlogStore
+
+
+async def _run_batch(args):
+    async with open_checkpointer() as checkpointer:
+        registry = GraphRegistry(use_async=True, checkpointer=checkpointer).startup()
+        runner = BatchRunner(registry, concurrency=args.concurrency, store=BlogStore.from_env())
+        return await runner.run_file(args.input, args.output)
+
+
+def run_batch(args):
+    if args.concurrency < 1:
+        raise SystemExit("--concurrency must be at least 1")
+    counts = asyncio.run(_run_batch(args))
+    print(f"Batch finished: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done.")
+
+
+def run_job_worker(args):
+    run_worker(concurrency=args.concurrency)
+
+
+def run_server(args):
+    from src.serving.server import serve
+    serve(host=args.host, port=args.port, workers=args.workers, llm_connections=args.llm_connections)
+
+
+def render_graph(args):
+    from src.graphs.visualization import workflow_graph, workflow_png, topology_hash
+    try:
+        workflow_png(cache_dir=args.cache_dir)
+    except Exception as e:
+        raise SystemExit(f"Could not render the workflow graph: {e}")
+    print(f"Workflow graph {topology_hash(workflow_graph())} cached.")
+
+
 def main():
-    print("Hello from blogagentic!")
+    parser = argparse.ArgumentParser(description="Agentic blog generator")
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="Generate blogs for every {topic, language} record in a JSONL file.")
+    batch.add_argument("input", help="JSONL file of {id?, topic, language} records")
+    batch.add_argument("-o", "--output", default="blogs.jsonl", help="JSONL file results are appended to; ids already there are skipped")
+    batch.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum generations in flight")
+    batch.set_defaults(func=run_batch)
+
+    worker = subparsers.add_parser("worker", help="Run a job worker that drains the queue behind POST /jobs.")
+    worker.add_argument("-c", "--concurrency", type=int, help="Jobs run at once by this process (default JOB_WORKER_CONCURRENCY or 4)")
+    worker.set_defaults(func=run_job_worker)
+
+    server = subparsers.add_parser("serve", help="Run the API with several worker processes (production mode).")
+    server.add_argument("--host", default="0.0.0.0")
+    server.add_argument("--port", type=int, default=8000)
+    server.add_argument("-w", "--workers", type=int, help="Server worker processes (default WEB_CONCURRENCY or one per core)")
+    server.add_argument("--llm-connections", type=int, help="LLM connections across all workers (default LLM_TOTAL_CONNECTIONS, else LLM_MAX_CONNECTIONS each)")
+    server.set_defaults(func=run_server)
+
+    graph = subparsers.add_parser("graph", help="Pre-render the workflow graph image the Streamlit UI shows.")
+    graph.add_argument("--cache-dir", help="Directory for the cached PNG (default GRAPH_IMAGE_CACHE_DIR or .cache)")
+    graph.set_defaults(func=render_graph)
+
+    args = parser.parse_args()
+    if not args.command:
+        print("Hello from blogagentic!")
+        parser.print_help()
+        return
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+from src.graphs.registry import graph_inputs
+from src.serving.admission import Rejected
+from src.graphs.checkpointing import ainvoke_resumable
+
+def record_id(record, position):
+    """
+    Stable id for a batch record: its own 'id', else a hash of its topic,
+    language and ``position`` in the input. The position keeps repeated
+    topics apart, so each runs on its own checkpoint thread and resumes on
+    its own; it also means that editing the input above a record without an
+    id reruns it. Explicit ids are used as given and must be unique.
+    """
+    if record.get("id"):
+        return str(record["id"])
+    language = record.get("languages") or record.get("language", "")
+    if isinstance(language, list):
+        language = ",".join(sorted(str(lang).lower() for lang in language))
+    key = f"{record.get('topic', '')}|{str(language).lower()}|{position}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+class InvalidRecord:
+    """Stands in for a JSONL line that could not be read as a record; reported, never generated."""
+
+    def __init__(self, line_number, error):
+        self.line_number = line_number
+        self.error = error
+
+    def result(self):
+        return {"id": f"line-{self.line_number}", "status": "error", "error": self.error}
+
+def parse_jsonl(lines):
+    """
+    Records from JSONL lines (str or bytes), skipping blank ones. A line that
+    is not a JSON object becomes an InvalidRecord, so one bad line is
+    reported instead of aborting the whole batch.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            yield InvalidRecord(number, f"Invalid JSON on line {number}: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield InvalidRecord(number, f"Line {number} is not a JSON object")
+            continue
+        yield record
+
+def iter_jsonl(path):
+    """Lazily read records from a JSONL file; see :func:`parse_jsonl`."""
+    with open(path, encoding="utf-8") as f:
+        yield from parse_jsonl(f)
+
+def completed_ids(path):
+    """Ids already written successfully to an output JSONL file."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn final line; that record simply reruns.
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+async def _aiter(records):
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
+
+class BatchRunner:
+    """
+    Runs a stream of {topic, language} records through the compiled graphs
+    with at most ``concurrency`` generations in flight. Records are pulled
+    lazily and results are yielded as they finish, so memory stays flat
+    regardless of the input size.
+    """
+
+    def __init__(self, registry, concurrency=8, admission=None, store=None):
+        if concurrency < 1:
+            raise ValueError("Batch concurrency must be at least 1")
+        self.registry = registry
+        self.concurrency = concurrency
+        # Optional AdmissionController shared with the other endpoints on the same worker.
+        self.admission = admission
+        # Optional BlogStore every finished blog is saved to.
+        self.store = store
+
+    async def _slot(self):
+        """
+        A generation slot from the admission controller, as an exit stack to
+        close when the record is done. A batch waits out overload instead of
+        failing its records.
+        """
+        stack = contextlib.AsyncExitStack()
+        while self.admission is not None:
+            try:
+                await stack.enter_async_context(self.admission.slot())
+                break
+            except Rejected as e:
+                await asyncio.sleep(e.retry_after)
+        return stack
+
+    async def _generate(self, rid, record):
+        if isinstance(record, InvalidRecord):
+            return record.result()
+        base = {"id": rid, "topic": record.get("topic", ""), "language": record.get("languages") or record.get("language", "")}
+        try:
+            # A record without a topic is reported as an error rather than dropped.
+            usecase, inputs = graph_inputs(record)
+            async with await self._slot():
+                # Checkpointed per record so a crash resumes mid-record; the output
+                # file records finished ones, so the thread is dropped on success.
+                graph = self.registry.get_graph(usecase=usecase)
+                state, _ = await ainvoke_resumable(graph, inputs, f"batch-{rid}", keep=False)
+            if self.store is not None:
+                base["stored"] = await asyncio.to_thread(
+                    self.store.save_state, state, self.registry.model_name, f"batch-{rid}"
+                )
+            if state.get("blogs"):
+                return {**base, "status": "ok", "blogs": state["blogs"]}
+            return {**base, "status": "ok", "blog": state.get("blog")}
+        except Exception as e:
+            return {**base, "status": "error", "error": str(e)}
+
+    async def run(self, records, skip_ids=()):
+        """Async generator of results, in completion order."""
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results = asyncio.Queue(maxsize=self.concurrency)
+        skip_ids = set(skip_ids)
+
+        async def produce():
+            try:
+                position = 0
+                async for record in _aiter(records):
+                    position += 1
+                    if isinstance(record, InvalidRecord):
+                        await queue.put((None, record))
+                    elif (rid := record_id(record, position)) not in skip_ids:
+                        await queue.put((rid, record))
+            finally:
+                # Even if reading the input fails, the workers must be told to stop,
+                # or they (and this generator) would wait on the queues forever.
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+        async def work():
+            while (item := await queue.get()) is not None:
+                await results.put(await self._generate(*item))
+            await results.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        try:
+            finished = 0
+            while finished < self.concurrency:
+                result = await results.get()
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+            # Surface errors from reading the input.
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_file(self, input_path, output_path):
+        """Process a JSONL file, appending to ``output_path`` and skipping ids already done."""
+        done = completed_ids(output_path)
+        counts = {"ok": 0, "error": 0, "skipped": len(done)}
+        with open(output_path, "a", encoding="utf-8") as out:
+            async for result in self.run(iter_jsonl(input_path), skip_ids=done):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[result["status"]] += 1
+        return counts
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCacheTier:
+    """In-process tier: an LRU dict bounded by entry count, with a TTL."""
+
+    def __init__(self, max_entries=1024, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteCacheTier:
+    """On-disk tier shared across restarts and worker processes, evicting least recently used rows."""
+
+    def __init__(self, path, max_entries=100000, ttl=7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Several server workers may share the file; wait out their writes.
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        # The row count is kept up to date by triggers, so a write never has to
+        # COUNT(*) the table to know whether to evict, whichever process wrote.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses_count (id INTEGER PRIMARY KEY CHECK (id = 0), n INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO responses_count SELECT 0, COUNT(*) FROM responses")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS responses_counted_insert AFTER INSERT ON responses "
+            "BEGIN UPDATE responses_count SET n = n + 1 WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS responses_counted_delete AFTER DELETE ON responses "
+            "BEGIN UPDATE responses_count SET n = n - 1 WHERE id = 0; END"
+        )
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            # An upsert, not INSERT OR REPLACE, whose implicit delete would skip the count trigger.
+            self._conn.execute(
+                "INSERT INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            overflow = self._rows() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def _rows(self):
+        return self._conn.execute("SELECT n FROM responses_count").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._rows()
+
+class ResponseCache:
+    """
+    Content-addressed cache for LLM responses. Lookups try the in-process
+    tier first, then the optional SQLite tier (promoting hits into memory).
+    Values must be JSON serialisable.
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else LRUCacheTier()
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from BLOG_CACHE_* environment variables."""
+        ttl = int(os.getenv("BLOG_CACHE_TTL", "86400"))
+        memory = LRUCacheTier(max_entries=int(os.getenv("BLOG_CACHE_MAX_ENTRIES", "1024")), ttl=ttl)
+        disk = None
+        if os.getenv("BLOG_CACHE_DB"):
+            disk = SQLiteCacheTier(
+                os.getenv("BLOG_CACHE_DB"),
+                max_entries=int(os.getenv("BLOG_CACHE_DB_MAX_ENTRIES", "100000")),
+                ttl=ttl,
+            )
+        return cls(memory=memory, disk=disk)
+
+    @staticmethod
+    def make_key(model, prompt, language="", kind="text"):
+        """Hash of everything that determines the response."""
+        payload = json.dumps([kind, model, language, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.metrics[name] += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits", "memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("hits", "disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+        self._count("sets")
+
+    async def aget(self, key):
+        """Async version of :meth:`get`: a memory hit is returned at once, the SQLite tier is read in a worker thread."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits", "memory_hits")
+            return value
+        if self.disk is None:
+            self._count("misses")
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key, value):
+        """Async version of :meth:`set`, writing the SQLite tier in a worker thread."""
+        if self.disk is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def stats(self):
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
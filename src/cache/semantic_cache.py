@@ -0,0 +1,198 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from src.monitoring.instrumentation import SEMANTIC_LOOKUPS, SEMANTIC_LOOKUP_SECONDS
+
+# Words that change how a topic is phrased, not what it is about.
+STOPWORDS = frozenset(
+    "a an and the of for to in on is are what whats how does do explained "
+    "explain guide overview about with its basics fundamentals 101".split()
+)
+
+class HashingEmbedder:
+    """
+    Cheap local topic embeddings: word, word-bigram and character-trigram
+    features hashed into a fixed-size vector, L2-normalised so a dot product
+    is the cosine. Bigrams make word order count ("cats better than dogs" is
+    not "dogs better than cats"). Needs no model download and embeds a topic
+    in microseconds on the CPU.
+    """
+
+    def __init__(self, dim=2048):
+        self.dim = dim
+
+    @staticmethod
+    def tokens(text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        # Crude singularisation so "system" and "systems" share features.
+        return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+                for w in words if w not in STOPWORDS]
+
+    def _features(self, text):
+        words = self.tokens(text)
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", 2.0
+        for word in words:
+            yield f"w:{word}", 2.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield f"c:{padded[i:i + 3]}", 1.0
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Near-duplicate cache for drafts: "Agentic AI" and "What is agentic AI?"
+    map to the same entry when the cosine similarity of their topic
+    embeddings reaches ``threshold``. Vectors live in one NumPy matrix so a
+    lookup is a single matrix-vector product. Entries are appended to a
+    SQLite table at ``path``, shared with other server workers: only the
+    vectors, models and topics are mirrored in memory, rows added since the
+    last read are picked up incrementally, and a draft is read from disk
+    only when a lookup hits. Concurrent adds from several workers are plain
+    inserts, so none is lost, and a lookup only queries the table when
+    ``PRAGMA data_version`` says another connection has written to it.
+    Entries are namespaced by model, and the oldest are dropped beyond
+    ``max_entries``.
+    """
+
+    def __init__(self, threshold=0.9, path=None, max_entries=5000, embedder=None):
+        self.threshold = threshold
+        self.path = path
+        self.max_entries = max_entries
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # AUTOINCREMENT so ids are never reused and "rows after the last id seen" is well defined.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drafts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "model TEXT NOT NULL, topic TEXT NOT NULL, vector BLOB NOT NULL, value TEXT NOT NULL)"
+        )
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._models, self._topics = [], []
+        self._last_id = 0
+        self._data_version = None
+        self.metrics = {"hits": 0, "misses": 0, "sets": 0, "lookup_seconds": 0.0}
+        with self._lock:
+            self._refresh()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the cache from BLOG_SEMANTIC_CACHE_* variables; None unless
+        BLOG_SEMANTIC_CACHE=on, as a near match serves another request's draft.
+        """
+        if os.getenv("BLOG_SEMANTIC_CACHE", "off") != "on":
+            return None
+        return cls(
+            threshold=float(os.getenv("BLOG_SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            path=os.getenv("BLOG_SEMANTIC_CACHE_PATH", "semantic_cache.sqlite"),
+            max_entries=int(os.getenv("BLOG_SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+        )
+
+    def _refresh(self):
+        """Mirror the rows appended, and drop those evicted, since the last read, by this process or another worker."""
+        # data_version only changes when another connection commits, so an idle
+        # lookup costs one pragma instead of a query.
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        self._read_new_rows()
+        oldest = self._conn.execute("SELECT MIN(id) FROM drafts").fetchone()[0]
+        if oldest is not None and len(self._ids) and self._ids[0] < oldest:
+            keep = self._ids >= oldest
+            self._vectors, self._ids = self._vectors[keep], self._ids[keep]
+            self._models = [m for m, k in zip(self._models, keep) if k]
+            self._topics = [t for t, k in zip(self._topics, keep) if k]
+
+    def _read_new_rows(self):
+        rows = self._conn.execute(
+            "SELECT id, model, topic, vector FROM drafts WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            return
+        self._last_id = rows[-1][0]
+        # Rows embedded with another dimension (a changed embedder) are ignored.
+        rows = [row for row in rows if len(row[3]) == self.embedder.dim * 4]
+        if not rows:
+            return
+        vectors = np.frombuffer(b"".join(row[3] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        self._vectors = np.vstack([self._vectors, vectors])[-self.max_entries:]
+        self._ids = np.concatenate([self._ids, np.array([row[0] for row in rows], dtype=np.int64)])[-self.max_entries:]
+        self._models = (self._models + [row[1] for row in rows])[-self.max_entries:]
+        self._topics = (self._topics + [row[2] for row in rows])[-self.max_entries:]
+
+    def lookup(self, model, topic):
+        """Return ``(value, similarity, cached_topic)`` for the closest match, or None."""
+        started = time.perf_counter()
+        query = self.embedder.embed(topic)
+        with self._lock:
+            self._refresh()
+            match = None
+            if len(self._models):
+                scores = self._vectors @ query
+                scores[np.array(self._models) != model] = -1.0
+                while match is None and scores[best := int(np.argmax(scores))] >= self.threshold:
+                    row = self._conn.execute("SELECT value FROM drafts WHERE id = ?", (int(self._ids[best]),)).fetchone()
+                    if row is None:
+                        # Evicted by another worker since the last refresh: try the next best.
+                        scores[best] = -1.0
+                        continue
+                    match = (row[0], float(scores[best]), self._topics[best])
+            elapsed = time.perf_counter() - started
+            self.metrics["hits" if match else "misses"] += 1
+            self.metrics["lookup_seconds"] += elapsed
+        SEMANTIC_LOOKUPS.labels(result="hit" if match else "miss").inc()
+        SEMANTIC_LOOKUP_SECONDS.observe(elapsed)
+        return match
+
+    def add(self, model, topic, value):
+        vector = self.embedder.embed(topic).astype(np.float32)
+        with self._lock:
+            # One appended row; nothing already stored is rewritten.
+            cursor = self._conn.execute(
+                "INSERT INTO drafts (model, topic, vector, value) VALUES (?, ?, ?, ?)",
+                (model, topic, vector.tobytes(), value),
+            )
+            self._conn.execute("DELETE FROM drafts WHERE id <= ?", (cursor.lastrowid - self.max_entries,))
+            self.metrics["sets"] += 1
+            # Our own commit does not change data_version; other workers' rows
+            # before this one are picked up here too.
+            self._read_new_rows()
+
+    async def alookup(self, model, topic):
+        """:meth:`lookup` in a worker thread, keeping SQLite reads off the event loop."""
+        return await asyncio.to_thread(self.lookup, model, topic)
+
+    async def aadd(self, model, topic, value):
+        """:meth:`add` in a worker thread, keeping SQLite writes off the event loop."""
+        await asyncio.to_thread(self.add, model, topic, value)
+
+    def __len__(self):
+        return len(self._models)
+
+    def stats(self):
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            "hits": self.metrics["hits"],
+            "misses": self.metrics["misses"],
+            "sets": self.metrics["sets"],
+            "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+            "mean_lookup_ms": round(self.metrics["lookup_seconds"] / lookups * 1000, 3) if lookups else 0.0,
+            "entries": len(self),
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from src.llms.throttling import (
+    DeadlineExceeded, SharedDeadline, context_with_deadline, current_deadline, time_left, within_deadline,
+)
+from src.monitoring.instrumentation import COALESCED_CALLS
+
+class _Call:
+    """A sync call in flight: followers wait on ``done`` for its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution. The
+    first caller (the leader) runs the work; callers arriving while it is in
+    flight wait for and share its result or exception. Nothing is kept after
+    the call finishes, so this complements caching rather than replacing it.
+    Each caller waits no longer than its own request deadline, and async
+    shared work runs against the latest deadline of the callers attached.
+    ``level`` labels the Prometheus counter of calls saved.
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self._deadlines = {}
+        self.metrics = {"leaders": 0, "followers": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.metrics[name] += 1
+        if name == "followers":
+            COALESCED_CALLS.labels(level=self.level).inc()
+
+    def do(self, key, fn):
+        """Run ``fn()`` once for all threads asking for ``key`` concurrently."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self._count("followers")
+            if not call.done.wait(time_left()):
+                raise DeadlineExceeded("Shared call still running at the request deadline")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        self._count("leaders")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, factory):
+        """
+        Await ``factory()`` once for all coroutines asking for ``key``
+        concurrently. The shared work runs as its own task, so a caller that
+        is cancelled (e.g. its client disconnected) does not cancel it for
+        the others.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                deadline = self._deadlines[key] = SharedDeadline(current_deadline(resolve=False))
+                context = context_with_deadline(deadline)
+                task = self._tasks[key] = asyncio.get_running_loop().create_task(factory(), context=context)
+                task.add_done_callback(lambda t: self._forget(key, t))
+            else:
+                self._deadlines[key].join(current_deadline(resolve=False))
+        self._count("leaders" if leader else "followers")
+        return await within_deadline(asyncio.shield(task), "Shared call still running at the request deadline")
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+                del self._deadlines[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller has gone away.
+            task.exception()
+
+    def stats(self):
+        with self._lock:
+            calls = self.metrics["leaders"] + self.metrics["followers"]
+            return {
+                **self.metrics,
+                "saved": self.metrics["followers"],
+                "saved_rate": self.metrics["followers"] / calls if calls else 0.0,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def open_checkpointer(kind=None, path=None):
+    """
+    Open the checkpointer the compiled graphs persist their progress to:
+    "sqlite" (default, BLOG_CHECKPOINT_DB), "memory" or "none".
+    """
+    kind = kind or os.getenv("BLOG_CHECKPOINTER", "sqlite")
+    if kind == "none":
+        yield None
+    elif kind == "memory":
+        yield InMemorySaver()
+    elif kind == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "The sqlite checkpointer needs langgraph-checkpoint-sqlite; "
+                "install it or set BLOG_CHECKPOINTER=memory or none."
+            ) from e
+        async with AsyncSqliteSaver.from_conn_string(path or os.getenv("BLOG_CHECKPOINT_DB", "checkpoints.sqlite")) as saver:
+            yield saver
+    else:
+        raise ValueError(f"Unknown checkpointer: {kind}")
+
+class RequestConflict(ValueError):
+    """A request id was reused with different inputs than the run it names."""
+
+def inputs_fingerprint(inputs):
+    """A hash of a run's initial state, kept in its checkpoint metadata."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def _same_request(inputs, state):
+    # A result kept outside the checkpointer only has its topic and languages to compare.
+    if state.get("topic") != inputs.get("topic"):
+        return False
+    if "languages" in inputs:
+        return set(state.get("blogs") or ()) == set(inputs["languages"])
+    return state.get("current_language") == (inputs.get("current_language") or "english")
+
+class CheckpointedRun:
+    """
+    One graph run under a checkpoint thread keyed by ``request_id``.
+
+    A retry with the same id resumes from the last completed node (or finds
+    the stored result if the run already finished) instead of paying for the
+    title and draft again. Runs without a client id get a throwaway thread,
+    and ``keep=False`` drops the thread once the run succeeds. A thread that
+    was dropped after its result was stored elsewhere is answered by
+    ``lookup(request_id)``, an async callable returning that final state.
+    Reusing a request id with different inputs raises RequestConflict rather
+    than answering with the other request's run.
+    """
+
+    def __init__(self, graph, inputs, request_id=None, keep=True, lookup=None):
+        self.graph = graph
+        self.request_id = request_id
+        self.lookup = lookup
+        self.keep = keep and request_id is not None
+        self.thread_id = request_id or f"anonymous-{uuid.uuid4()}"
+        self.fingerprint = inputs_fingerprint(inputs)
+        self.config = {
+            "configurable": {"thread_id": self.thread_id},
+            "metadata": {"inputs_fingerprint": self.fingerprint},
+        } if graph.checkpointer else None
+        self.inputs = inputs
+        self.status = "fresh"
+        self.result = None
+
+    async def prepare(self):
+        """Decide between a fresh run, a resume (inputs=None) or a stored result."""
+        if self.config is None:
+            return self
+        snapshot = await self.graph.aget_state(self.config)
+        stored_fingerprint = (snapshot.metadata or {}).get("inputs_fingerprint")
+        if stored_fingerprint is not None and stored_fingerprint != self.fingerprint:
+            raise RequestConflict(f"Request id {self.request_id!r} was already used for different inputs")
+        if snapshot.values and not snapshot.next:
+            self.status, self.result = "completed", snapshot.values
+        elif snapshot.next:
+            self.status, self.inputs = "resumed", None
+        elif self.request_id is not None and self.lookup is not None:
+            stored = await self.lookup(self.request_id)
+            if stored is not None and not _same_request(self.inputs, stored):
+                raise RequestConflict(f"Request id {self.request_id!r} was already used for different inputs")
+            if stored is not None:
+                self.status, self.result = "completed", stored
+        return self
+
+    async def finish(self, succeeded):
+        if self.config is not None and not self.keep and (succeeded or self.request_id is None):
+            await self.graph.checkpointer.adelete_thread(self.thread_id)
+
+async def ainvoke_resumable(graph, inputs, request_id=None, keep=True, lookup=None):
+    """Invoke with checkpoint/resume semantics; returns ``(state, status)``."""
+    run = await CheckpointedRun(graph, inputs, request_id, keep, lookup).prepare()
+    if run.result is not None:
+        return run.result, run.status
+    succeeded = False
+    try:
+        state = await graph.ainvoke(run.inputs, run.config)
+        succeeded = True
+        return state, run.status
+    finally:
+        await run.finish(succeeded)
+
+async def discard_thread(checkpointer, thread_id):
+    """Drop a checkpoint thread whose result is kept elsewhere (e.g. in the blog store)."""
+    if checkpointer is not None:
+        await checkpointer.adelete_thread(thread_id)
+
+async def sweep_checkpoints(checkpointer, max_age):
+    """Delete the checkpoint threads not written to for ``max_age`` seconds; returns how many."""
+    latest = {}
+    async for item in checkpointer.alist(None):
+        thread_id = item.config["configurable"]["thread_id"]
+        written = datetime.fromisoformat(item.checkpoint["ts"]).timestamp()
+        latest[thread_id] = max(written, latest.get(thread_id, 0.0))
+    cutoff = time.time() - max_age
+    stale = [thread_id for thread_id, written in latest.items() if written < cutoff]
+    for thread_id in stale:
+        await checkpointer.adelete_thread(thread_id)
+    return len(stale)
+
+async def sweep_periodically(checkpointer, max_age=None, interval=None):
+    """
+    Background task expiring threads kept for retries that never came (or for
+    runs that failed for good): every BLOG_CHECKPOINT_SWEEP_SECONDS, threads
+    older than BLOG_CHECKPOINT_TTL seconds are deleted.
+    """
+    max_age = max_age or float(os.getenv("BLOG_CHECKPOINT_TTL", "86400"))
+    interval = interval or float(os.getenv("BLOG_CHECKPOINT_SWEEP_SECONDS", "3600"))
+    while True:
+        try:
+            removed = await sweep_checkpoints(checkpointer, max_age)
+            if removed:
+                logger.info("removed %d checkpoint threads older than %.0fs", removed, max_age)
+        except Exception:
+            logger.exception("checkpoint sweep failed")
+        await asyncio.sleep(interval)
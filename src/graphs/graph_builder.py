@@ -1,58 +1,84 @@
 from langgraph.graph import StateGraph, START, END
 from src.states.blogstate import BlogState
 from src.nodes.blog_node import BlogNode
+from src.monitoring.instrumentation import instrument_node
 from dotenv import load_dotenv
 from src.llms.groqllm import GroqLLM
 
 class GraphBuilder:
-    def __init__(self, llm):
+    def __init__(self, llm, cache=None, scheduler=None, semantic_cache=None, single_flight=None):
         self.llm = llm
         self.graph = StateGraph(BlogState)
-        self.blog_node_obj = BlogNode(self.llm)
+        self.blog_node_obj = BlogNode(
+            self.llm, cache=cache, scheduler=scheduler, semantic_cache=semantic_cache, single_flight=single_flight
+        )
+
+    def _add_node(self, name, fn):
+        """Register a node wrapped with latency/token instrumentation."""
+        self.graph.add_node(name, instrument_node(name, fn))
 
-    def build_graph(self):
+    def build_graph(self, use_async=False):
         """
         Builds a graph with conditional routing for different languages,
-        matching the desired structure.
+        matching the desired structure. With ``use_async`` the LLM-calling
+        nodes are the ``ainvoke`` based ones, for driving with ``graph.ainvoke``.
         """
+        node = self.blog_node_obj
         # Define the nodes
-        self.graph.add_node("title_creation", self.blog_node_obj.title_creation)
-        self.graph.add_node("content_generation", self.blog_node_obj.content_generation)
-        self.graph.add_node("route", self.blog_node_obj.route) # The routing node
-        self.graph.add_node("english_node", self.blog_node_obj.english_structuring)
-        self.graph.add_node("german_node", self.blog_node_obj.german_translation)
+        self._add_node("title_creation", node.atitle_creation if use_async else node.title_creation)
+        self._add_node("content_generation", node.acontent_generation if use_async else node.content_generation)
+        self._add_node("route", node.route) # The routing node
+        self._add_node("english_node", node.aenglish_structuring if use_async else node.english_structuring)
+        self._add_node("german_node", node.agerman_translation if use_async else node.german_translation)
+        self._add_node("structure_language", node.astructure_language if use_async else node.structure_language)
 
         # Define the edges
+        # Title and content only depend on the topic: fan out from START and
+        # join on the route node once both drafts are merged into state.
         self.graph.add_edge(START, "title_creation")
-        self.graph.add_edge("title_creation", "content_generation")
-        self.graph.add_edge("content_generation", "route")
+        self.graph.add_edge(START, "content_generation")
+        self.graph.add_edge(["title_creation", "content_generation"], "route")
 
-        # Add the conditional branching
+        # Add the conditional branching; a list of languages fans out via Send
         self.graph.add_conditional_edges(
             "route",
             self.blog_node_obj.route_decision,
             {
                 "english": "english_node",
-                "german": "german_node"
+                "german": "german_node",
+                "structure_language": "structure_language"
             }
         )
 
         # Connect the final nodes to the end
         self.graph.add_edge("english_node", END)
         self.graph.add_edge("german_node", END)
+        self.graph.add_edge("structure_language", END)
         
         return self.graph
 
-    def setup_graph(self, usecase=None):
-        """Sets up and compiles the graph."""
-        return self.build_graph().compile()
+    def setup_graph(self, usecase=None, use_async=False, checkpointer=None):
+        """Sets up and compiles the graph, persisting progress to ``checkpointer`` if given."""
+        return self.build_graph(use_async=use_async).compile(checkpointer=checkpointer)
 
 # --- Section for langgraph dev ---
-load_dotenv()
-llm = GroqLLM().get_llm()
-builder = GraphBuilder(llm)
-# This is the variable that `langgraph dev` will look for.
-graph = builder.build_graph().compile()
+# langgraph.json points at this factory, so importing the module stays cheap
+# and no LLM client is created until `langgraph dev` actually asks for a graph.
+def make_graph():
+    load_dotenv()
+    llm = GroqLLM().get_llm()
+    return GraphBuilder(llm).build_graph().compile()
+
+_graph = None
+
+def __getattr__(name):
+    # Keeps `from src.graphs.graph_builder import graph` working, built on first access.
+    global _graph
+    if name == "graph":
+        if _graph is None:
+            _graph = make_graph()
+        return _graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
@@ -0,0 +1,147 @@
+import os
+import threading
+from src.graphs.graph_builder import GraphBuilder
+from src.nodes.blog_node import BlogNode
+from src.nodes.prompts import PROMPTS
+from src.llms.groqllm import GroqLLM
+from src.llms.fakellm import FakeLLM
+from src.llms.router import LLMRouter
+from src.cache.response_cache import ResponseCache
+from src.cache.semantic_cache import SemanticCache
+from src.cache.single_flight import SingleFlight
+
+# How the structuring step handles a draft: one call, or one call per section.
+STRUCTURING_MODES = ("single", "sections")
+
+def graph_inputs(data):
+    """
+    Pick the graph variant and initial state for a request body. Raises
+    ValueError for a missing topic, malformed languages or an unknown
+    structuring mode; a lone string in ``languages`` counts as one
+    language, and repeats are structured once.
+    """
+    topic = data.get("topic", "")
+    if not isinstance(topic, str) or not topic.strip():
+        raise ValueError("A non-empty 'topic' is required")
+    language = data.get("language", "")
+    languages = data.get("languages")
+    if languages is None and isinstance(language, list):
+        languages = language
+    if isinstance(languages, str):
+        languages = [languages]
+    if languages is not None:
+        if not isinstance(languages, list) or not languages:
+            raise ValueError("'languages' must be a non-empty list of strings")
+        if not all(isinstance(lang, str) and lang.strip() for lang in languages):
+            raise ValueError("'language' and 'languages' must be strings")
+        languages = list(dict.fromkeys(lang.strip().lower() for lang in languages))
+    elif not isinstance(language, str):
+        raise ValueError("'language' and 'languages' must be strings")
+    structuring = data.get("structuring", "single")
+    if structuring not in STRUCTURING_MODES:
+        raise ValueError(f"Unknown structuring {structuring!r}; expected one of {STRUCTURING_MODES}")
+    if languages:
+        return "language", {"topic": topic, "languages": languages, "structuring": structuring}
+    if language:
+        return "language", {"topic": topic, "current_language": language.lower(), "structuring": structuring}
+    return "topic", {"topic": topic, "structuring": structuring}
+
+class GraphRegistry:
+    """
+    Holds the LLM client and the compiled graphs for the lifetime of the app,
+    so request handlers reuse them instead of rebuilding per request.
+    """
+    VARIANTS = ("topic", "language")
+
+    def __init__(self, llm_factory=None, use_async=True, cache=None, scheduler=None, checkpointer=None, semantic_cache=None):
+        self.use_async = use_async
+        self.checkpointer = checkpointer
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else SemanticCache.from_env()
+        # One in-flight table for every graph variant, so identical LLM calls
+        # coalesce whichever endpoint or variant they come from.
+        self.single_flight = SingleFlight("llm")
+        self.router = None
+        provider = os.getenv("LLM_PROVIDER", "groq")
+        if llm_factory is None and provider == "fake":
+            # Offline runs (benchmarks, load tests) use the deterministic fake model.
+            llm_factory = lambda: FakeLLM().get_llm()
+        elif llm_factory is None and provider == "router":
+            # Several backends with per-node choice; each backend has its own rate
+            # limits, and failover replaces scheduler retries.
+            self.router = LLMRouter.from_env()
+            llm_factory = self.router.get_llm
+        elif llm_factory is None:
+            llm_factory = lambda: GroqLLM().get_llm(pooled=True, max_retries=0)
+            scheduler = scheduler or GroqLLM.get_scheduler()
+        self._llm_factory = llm_factory
+        self.scheduler = scheduler
+        self._llm = None
+        self._graphs = {}
+        self._node = None
+        self._lock = threading.Lock()
+        self.counters = {"llm_cold": 0, "llm_warm": 0, "graph_cold": 0, "graph_warm": 0}
+
+    def startup(self):
+        """Eagerly build the client and every graph variant."""
+        for usecase in self.VARIANTS:
+            self.get_graph(usecase)
+        return self
+
+    def get_llm(self):
+        """Return the shared LLM client, creating it on first use."""
+        with self._lock:
+            if self._llm is None:
+                self._llm = self._llm_factory()
+                self.counters["llm_cold"] += 1
+            else:
+                self.counters["llm_warm"] += 1
+            return self._llm
+
+    def get_node(self):
+        """A BlogNode sharing the graphs' client, caches and scheduler, for work outside a graph run."""
+        llm = self.get_llm()
+        with self._lock:
+            if self._node is None:
+                self._node = BlogNode(
+                    llm, cache=self.cache, scheduler=self.scheduler,
+                    semantic_cache=self.semantic_cache, single_flight=self.single_flight,
+                )
+            return self._node
+
+    @property
+    def model_name(self):
+        """Name of the model behind the graphs, recorded with stored blogs."""
+        llm = self.get_llm()
+        return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+    def get_graph(self, usecase="topic"):
+        """Return the compiled graph for a variant, compiling it on first use."""
+        llm = self.get_llm()
+        with self._lock:
+            graph = self._graphs.get(usecase)
+            if graph is None:
+                builder = GraphBuilder(
+                    llm, cache=self.cache, scheduler=self.scheduler,
+                    semantic_cache=self.semantic_cache, single_flight=self.single_flight,
+                )
+                graph = builder.setup_graph(usecase=usecase, use_async=self.use_async, checkpointer=self.checkpointer)
+                self._graphs[usecase] = graph
+                self.counters["graph_cold"] += 1
+            else:
+                self.counters["graph_warm"] += 1
+            return graph
+
+    def stats(self):
+        """Snapshot of cold vs. warm usage counters."""
+        with self._lock:
+            stats = {**self.counters, "graphs": sorted(self._graphs), "cache": self.cache.stats()}
+        stats["single_flight"] = self.single_flight.stats()
+        stats["prompts"] = PROMPTS.stats()
+        if self.semantic_cache is not None:
+            stats["semantic_cache"] = self.semantic_cache.stats()
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        if self.router is not None:
+            stats["router"] = self.router.stats()
+        return stats
@@ -0,0 +1,53 @@
+import json
+from src.graphs.checkpointing import CheckpointedRun
+from src.llms.throttling import no_hedging
+
+def sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_blog_events(graph, inputs, request_id=None, lookup=None):
+    """
+    Drive ``graph.astream_events`` and yield ``(event, data)`` pairs for clients:
+
+    - ``title`` as soon as title_creation finishes,
+    - ``token`` for every content chunk content_generation streams,
+    - ``blog`` with the final state once the graph completes.
+
+    Runs are checkpointed like /blogs, so a retried ``request_id`` resumes.
+    """
+    run = await CheckpointedRun(graph, inputs, request_id, lookup=lookup).prepare()
+    if run.result is not None:
+        yield "blog", run.result
+        return
+    succeeded = False
+    try:
+        with no_hedging():
+            async for event, data in _graph_events(graph, run.inputs, run.config):
+                yield event, data
+        succeeded = True
+    finally:
+        await run.finish(succeeded)
+
+async def _graph_events(graph, inputs, config):
+    streamed_content = False
+    async for event in graph.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node == "content_generation":
+            text = event["data"]["chunk"].content
+            if text:
+                streamed_content = True
+                yield "token", {"text": text}
+
+        elif kind == "on_chain_end" and event["name"] == "title_creation":
+            yield "title", {"title": event["data"]["output"]["blog"]["title"]}
+
+        elif kind == "on_chain_end" and event["name"] == "content_generation":
+            # Cached drafts never hit the model, so send them as a single chunk.
+            if not streamed_content:
+                yield "token", {"text": event["data"]["output"]["blog"]["content"]}
+
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            yield "blog", event["data"]["output"]
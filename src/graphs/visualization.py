@@ -0,0 +1,39 @@
+import hashlib
+import json
+import os
+from src.graphs.graph_builder import GraphBuilder
+
+def workflow_graph():
+    """The compiled workflow, for drawing only: nodes are never run, so no LLM client is needed."""
+    return GraphBuilder(llm=None).build_graph().compile()
+
+def topology_hash(compiled):
+    """Short hash of a graph's nodes and edges; changes whenever the drawing would."""
+    drawable = compiled.get_graph()
+    topology = {
+        "nodes": sorted(drawable.nodes),
+        "edges": sorted(
+            (edge.source, edge.target, bool(edge.conditional), str(edge.data or "")) for edge in drawable.edges
+        ),
+    }
+    return hashlib.sha256(json.dumps(topology, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def workflow_png(cache_dir=None, compiled=None):
+    """
+    PNG of the workflow graph, cached on disk under its topology hash.
+    Only a cache miss pays for ``draw_mermaid_png()`` (a network round trip
+    to the Mermaid renderer); an unchanged graph is read straight from disk.
+    """
+    compiled = compiled or workflow_graph()
+    cache_dir = cache_dir or os.getenv("GRAPH_IMAGE_CACHE_DIR", ".cache")
+    path = os.path.join(cache_dir, f"workflow-{topology_hash(compiled)}.png")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    image = compiled.get_graph().draw_mermaid_png()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(image)
+    os.replace(tmp, path)
+    return image
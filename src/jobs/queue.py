@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+
+class JobQueue:
+    """
+    Durable priority queue of generation jobs in SQLite, shared by the API
+    process (which submits and polls) and any number of worker processes
+    (which claim and run). Running jobs send heartbeats; a job whose worker
+    stopped heartbeating is handed to the next worker that asks for work.
+    """
+
+    def __init__(self, path=None, stale_after=60.0):
+        self.path = path or os.getenv("JOB_QUEUE_DB", "jobs.sqlite")
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, worker TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, priority DESC, created_at)")
+
+    def submit(self, payload, priority=0):
+        """Queue a job; higher priorities are claimed first. Returns its id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, priority, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, int(priority), json.dumps(payload), time.time()),
+            )
+        return job_id
+
+    def claim(self, worker):
+        """Atomically take the next queued (or abandoned) job, or return None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED, RUNNING, now - self.stale_after),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"id": row["id"], "payload": json.loads(row["payload"]), "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, job_id):
+        """Refresh a running job's heartbeat; returns True if cancellation was requested."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, RUNNING),
+            )
+
+    def complete(self, job_id, result):
+        self._finish(job_id, SUCCEEDED, result=result)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, FAILED, error=error)
+
+    def mark_cancelled(self, job_id):
+        self._finish(job_id, CANCELLED)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: queued jobs are cancelled at once, running ones are
+        flagged and stopped by their worker at its next heartbeat.
+        Returns the job's status afterwards, or None if it does not exist.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {key: row[key] for key in ("id", "status", "priority", "attempts", "created_at", "started_at", "finished_at", "error")}
+        job["cancel_requested"] = bool(row["cancel_requested"])
+        job["request"] = json.loads(row["payload"])
+        job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
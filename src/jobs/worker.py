@@ -0,0 +1,106 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+from pydantic_core import to_jsonable_python
+from src.graphs.registry import GraphRegistry, graph_inputs
+from src.graphs.checkpointing import open_checkpointer, ainvoke_resumable
+from src.jobs.queue import JobQueue
+from src.store.blog_store import BlogStore
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the job it is running was cancelled."""
+
+async def _run_job(queue, registry, job, heartbeat):
+    usecase, inputs = graph_inputs(job["payload"])
+    graph = registry.get_graph(usecase=usecase)
+    # Checkpointed under the job id, so a job re-claimed after a worker died
+    # resumes from its last completed node.
+    task = asyncio.create_task(ainvoke_resumable(graph, inputs, f"job-{job['id']}", keep=False))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=heartbeat)
+        if done:
+            state, _ = task.result()
+            return state
+        if await asyncio.to_thread(queue.heartbeat, job["id"]):
+            task.cancel()
+            raise JobCancelled(job["id"])
+
+async def _worker_loop(queue, registry, store, name, poll_interval, heartbeat):
+    # Queue calls run in threads: they can wait on other processes' write
+    # locks, which would stall every job this process is running.
+    while True:
+        job = await asyncio.to_thread(queue.claim, name)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            continue
+        try:
+            state = await _run_job(queue, registry, job, heartbeat)
+        except JobCancelled:
+            await asyncio.to_thread(queue.mark_cancelled, job["id"])
+        except Exception as e:
+            await asyncio.to_thread(queue.fail, job["id"], str(e))
+        else:
+            result = {"blogs": state["blogs"]} if state.get("blogs") else {"blog": state.get("blog")}
+            if store is not None:
+                result["stored"] = await asyncio.to_thread(
+                    store.save_state, state, registry.model_name, f"job-{job['id']}"
+                )
+            await asyncio.to_thread(queue.complete, job["id"], to_jsonable_python(result))
+
+async def _serve(queue_path, name, concurrency, poll_interval, heartbeat):
+    queue = JobQueue(queue_path, stale_after=heartbeat * 6)
+    async with open_checkpointer() as checkpointer:
+        registry = GraphRegistry(use_async=True, checkpointer=checkpointer).startup()
+        store = BlogStore.from_env()
+        await asyncio.gather(*(
+            _worker_loop(queue, registry, store, f"{name}/{slot}", poll_interval, heartbeat)
+            for slot in range(concurrency)
+        ))
+
+def run_worker(queue_path=None, concurrency=None, poll_interval=0.5, heartbeat=5.0):
+    """
+    Entry point of one worker process: builds its own LLM client and compiled
+    graphs, then runs up to ``concurrency`` jobs at a time until killed.
+    """
+    concurrency = concurrency or int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        asyncio.run(_serve(queue_path, name, concurrency, poll_interval, heartbeat))
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the whole process group; running jobs are re-claimed later.
+        pass
+
+class WorkerPool:
+    """
+    ``processes`` worker processes draining a JobQueue, so generations run on
+    their own cores instead of in the API process. Workers can also be started
+    separately (``python main.py worker``) to scale the two tiers apart.
+    """
+
+    def __init__(self, processes=None, queue_path=None, concurrency=None):
+        self.processes = int(os.getenv("JOB_WORKERS", "2")) if processes is None else processes
+        self.queue_path = queue_path
+        self.concurrency = concurrency
+        self._workers = []
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.processes):
+            worker = context.Process(
+                target=run_worker, args=(self.queue_path, self.concurrency), daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self, timeout=5.0):
+        # Jobs still running are re-claimed after their heartbeat goes stale.
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def alive(self):
+        return sum(worker.is_alive() for worker in self._workers)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+import typing
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, PrivateAttr
+
+WORDS = ("agents plan tasks call tools observe results and iterate until the goal is met "
+         "while memory keeps context and evaluation guards quality").split()
+
+class FakeProviderError(Exception):
+    """Injected failure, shaped like a provider 503 so it is retryable."""
+    status_code = 503
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, offline stand-in for ChatGroq. Responses are canned text
+    derived from a hash of the prompt; timing follows ``latency`` (time to
+    first token) plus ``tokens_per_second`` for the generated tokens, so the
+    graph and server can be benchmarked without network access.
+    ``fail_rate`` injects provider errors after the time (and tokens) of a
+    call have been spent, to measure how much work failures waste.
+    ``malformed_rate`` makes structured calls return JSON cut off part way,
+    unparsed, the way a model that hit its output limit does.
+    """
+    model_name: str = "fake-blog-model"
+    latency: float = 0.05
+    tokens_per_second: float = 1000.0
+    content_tokens: int = 400
+    title_tokens: int = 12
+    structured_tokens: int = 300
+    fail_rate: float = 0.0
+    malformed_rate: float = 0.0
+    seed: int = 0
+    _rng: random.Random = PrivateAttr(default=None)
+    _tokens_used: int = PrivateAttr(default=0)
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def tokens_used(self):
+        """Prompt plus completion tokens of every call made so far, failed ones included."""
+        return self._tokens_used
+
+    @property
+    def _llm_type(self):
+        return "fake-blog"
+
+    @staticmethod
+    def _prompt_text(messages):
+        if isinstance(messages, str):
+            return messages
+        if hasattr(messages, "to_messages"):
+            messages = messages.to_messages()
+        return "\n".join(str(message.content) for message in messages)
+
+    def _words(self, prompt, count):
+        offset = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+        return [WORDS[(offset + i) % len(WORDS)] for i in range(count)]
+
+    def _text_for(self, prompt):
+        """A short title for title prompts, otherwise a markdown draft with headings."""
+        if "blog title" in prompt:
+            return " ".join(self._words(prompt, self.title_tokens)).title()
+        words = self._words(prompt, self.content_tokens)
+        per_section = max(20, len(words) // 4)
+        parts = [" ".join(words[:per_section // 2])]
+        for number, start in enumerate(range(per_section // 2, len(words), per_section), 1):
+            parts.append(f"## Part {number}\n" + " ".join(words[start:start + per_section]))
+        return "\n\n".join(parts)
+
+    def _usage(self, prompt, text):
+        input_tokens = max(1, len(prompt) // 4)
+        output_tokens = len(text.split())
+        self._tokens_used += input_tokens + output_tokens
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            raise FakeProviderError("injected provider failure")
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _duration(self, tokens):
+        return self.latency + tokens / self.tokens_per_second
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt_text(messages)
+        text = self._text_for(prompt)
+        time.sleep(self._duration(len(text.split())))
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt_text(messages)
+        text = self._text_for(prompt)
+        await asyncio.sleep(self._duration(len(text.split())))
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt_text(messages)
+        text = self._text_for(prompt)
+        await asyncio.sleep(self.latency)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = AIMessageChunk(content=word if i == 0 else " " + word)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
+
+    def _fake_value(self, annotation, prompt, name):
+        """Fill one field of a pydantic model with canned data."""
+        if typing.get_origin(annotation) in (list, typing.List):
+            (item,) = typing.get_args(annotation)
+            return [self._fake_value(item, f"{prompt}{i}", name) for i in range(3)]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return self._fake_instance(annotation, prompt)
+        count = self.title_tokens if "title" in name else max(10, self.structured_tokens // 6)
+        return " ".join(self._words(f"{prompt}{name}", count))
+
+    def _fake_instance(self, schema, prompt):
+        return schema(**{
+            name: self._fake_value(field.annotation, prompt, name)
+            for name, field in schema.model_fields.items()
+        })
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        """Return canned instances of ``schema`` with the same timing model."""
+        def build(messages):
+            prompt = self._prompt_text(messages)
+            parsed = self._fake_instance(schema, prompt)
+            text = parsed.model_dump_json()
+            if self.malformed_rate and self._rng.random() < self.malformed_rate:
+                text = text[:int(len(text) * self._rng.uniform(0.3, 0.95))]
+                raw = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+                error = ValueError(f"Truncated {schema.__name__} output")
+                if not include_raw:
+                    raise error
+                return {"raw": raw, "parsed": None, "parsing_error": error}
+            raw = AIMessage(content="", usage_metadata=self._usage(prompt, text))
+            return {"raw": raw, "parsed": parsed, "parsing_error": None} if include_raw else parsed
+
+        def invoke(messages):
+            time.sleep(self._duration(self.structured_tokens))
+            return build(messages)
+
+        async def ainvoke(messages):
+            await asyncio.sleep(self._duration(self.structured_tokens))
+            return build(messages)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"Fake{schema.__name__}")
+
+class FakeLLM:
+    """Same interface as GroqLLM, configured from FAKE_LLM_* environment variables."""
+
+    def __init__(self, **overrides):
+        self.settings = {
+            "latency": float(os.getenv("FAKE_LLM_LATENCY", "0.05")),
+            "tokens_per_second": float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "1000")),
+            "content_tokens": int(os.getenv("FAKE_LLM_CONTENT_TOKENS", "400")),
+            "fail_rate": float(os.getenv("FAKE_LLM_FAIL_RATE", "0")),
+            "malformed_rate": float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0")),
+            **overrides,
+        }
+
+    def get_llm(self, **kwargs):
+        return FakeChatModel(**self.settings)
@@ -1,20 +1,55 @@
 from langchain_groq import ChatGroq
-import os 
+import httpx
+import os
 from dotenv import load_dotenv
+from src.llms.throttling import CallScheduler
 
 class GroqLLM:
-    def __init__(self):
+    # One scheduler per process, so every node shares the provider's limits.
+    _scheduler = None
+
+    def __init__(self, max_connections=None, max_keepalive_connections=None):
         load_dotenv()
+        self.max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = max_keepalive_connections or int(
+            os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+
+    def _http_limits(self):
+        """Connection pool limits shared by the sync and async transports."""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+
+    @classmethod
+    def get_scheduler(cls):
+        """The process-wide rate limiter / retry scheduler for Groq calls."""
+        if cls._scheduler is None:
+            cls._scheduler = CallScheduler.from_env()
+        return cls._scheduler
 
-    def get_llm(self):
+    def get_llm(self, pooled=False, max_retries=2, model=None):
         try:
             os.environ['GROQ_API_KEY']=self.groq_api_key=os.getenv("GROQ_API_KEY")
+            # Long-lived callers (the API server) pass pooled=True so every request
+            # reuses the same keep-alive connections instead of opening new ones.
+            # Callers going through get_scheduler() pass max_retries=0 so retries
+            # are not stacked on top of the scheduler's own backoff.
+            http_kwargs = {}
+            if pooled:
+                http_kwargs = {
+                    "http_client": httpx.Client(limits=self._http_limits(), timeout=60),
+                    "http_async_client": httpx.AsyncClient(limits=self._http_limits(), timeout=60),
+                }
             # Increase the timeout to 60 seconds to make the connection more resilient
             llm=ChatGroq(
                 api_key=self.groq_api_key,
-                model="llama-3.1-8b-instant",
-                timeout=60 
+                model=model or os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
+                timeout=60,
+                max_retries=max_retries,
+                **http_kwargs
             )
             return llm
         except Exception as e:
-            raise ValueError(f"Error occurred with exception : {e}")
\ No newline at end of file
+            raise ValueError(f"Error occurred with exception : {e}")
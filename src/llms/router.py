@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+from src.llms.groqllm import GroqLLM
+from src.llms.fakellm import FakeLLM
+from src.llms.throttling import CallScheduler, DeadlineExceeded, failed_generation, no_hedging
+from src.monitoring.instrumentation import current_node, ROUTER_CALLS
+
+# Inner calls run without callbacks: the routed model already reports the
+# call, and streaming it twice would duplicate tokens in astream_events.
+_QUIET = {"callbacks": []}
+
+DEFAULT_BACKENDS = [
+    {"name": "groq-small", "provider": "groq", "model": "llama-3.1-8b-instant"},
+    {"name": "groq-large", "provider": "groq", "model": "llama-3.3-70b-versatile"},
+]
+
+# Drafting favours the small model; structuring (JSON output) the larger one.
+DEFAULT_ROUTES = {
+    "title_creation": ["groq-small"],
+    "content_generation": ["groq-small"],
+    "english_node": ["groq-large"],
+    "german_node": ["groq-large"],
+    "structure_language": ["groq-large"],
+}
+
+# LLM_BACKENDS keys that configure the backend's rate limits, not its chat model.
+LIMIT_KEYS = ("requests_per_minute", "tokens_per_minute")
+
+def build_backend_model(spec):
+    """Create the chat model for one LLM_BACKENDS entry."""
+    settings = {key: value for key, value in spec.items() if key not in ("name", "provider", *LIMIT_KEYS)}
+    provider = spec.get("provider", "groq")
+    if provider == "groq":
+        return GroqLLM().get_llm(pooled=True, max_retries=0, model=settings.get("model"))
+    if provider == "fake":
+        return FakeLLM(**settings).get_llm()
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+def build_backend_scheduler(spec):
+    """
+    Rate limits and Retry-After handling for one LLM_BACKENDS entry: Groq
+    backends default to GROQ_RPM / GROQ_TPM, other providers are only limited
+    when the entry sets ``requests_per_minute`` or ``tokens_per_minute``.
+    Failures are not retried on the same backend; the router fails over.
+    """
+    limits = {key: spec.get(key) for key in LIMIT_KEYS}
+    if spec.get("provider", "groq") != "groq" and not any(limits.values()):
+        return None
+    return CallScheduler.from_env(name=spec["name"], max_retries=0, **limits)
+
+class Backend:
+    """
+    One chat model the router can use, with its rolling health: an EWMA of
+    call latency, the error rate over the last ``window`` calls and a circuit
+    breaker that takes it out of rotation for ``cooldown`` seconds after
+    ``failure_threshold`` consecutive failures.
+    """
+
+    def __init__(self, name, model, window=50, alpha=0.2, failure_threshold=3, cooldown=30.0, scheduler=None):
+        self.name = name
+        self.model = model
+        # Optional CallScheduler holding this backend to its own provider limits.
+        self.scheduler = scheduler
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency = None
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._structured = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self):
+        return getattr(self.model, "model_name", None) or self.name
+
+    @property
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self):
+        return time.monotonic() >= self.open_until
+
+    def structured(self, schema, include_raw):
+        key = (schema, include_raw)
+        if key not in self._structured:
+            self._structured[key] = self.model.with_structured_output(schema, include_raw=include_raw)
+        return self._structured[key]
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.latency = seconds if self.latency is None else self.alpha * seconds + (1 - self.alpha) * self.latency
+            self.outcomes.append(0)
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(1)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                # Half-open afterwards: one more failure trips it again.
+                self.consecutive_failures = self.failure_threshold - 1
+
+    def run(self, fn, prompt_text):
+        """Call ``fn(self)`` under this backend's scheduler, if it has one."""
+        if self.scheduler is None:
+            return fn(self)
+        return self.scheduler.call(lambda: fn(self), prompt_text)
+
+    async def arun(self, afn, prompt_text):
+        """Async version of :meth:`run`."""
+        if self.scheduler is None:
+            return await afn(self)
+        return await self.scheduler.acall(lambda: afn(self), prompt_text)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "model": self.model_name,
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "error_rate": round(self.error_rate, 3),
+                "calls": len(self.outcomes),
+                "healthy": self.healthy(),
+            }
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+class LLMRouter:
+    """
+    Routes every LLM call across several chat backends. Each graph node has
+    a list of preferred backends (``routes``, e.g. a small model for titles
+    and a larger one for structuring); within it the healthy backend with
+    the lowest recent latency is tried first (untried ones first of all, so
+    each gets measured). A failing call fails over to the next candidate,
+    then to the other configured backends, and only raises when all fail.
+    Each backend waits for its own rate limits first, and a Retry-After it
+    answers with holds back its later calls.
+
+    ``get_llm()`` returns a chat model, so the router drops in wherever a
+    GroqLLM or FakeLLM client is used.
+    """
+
+    def __init__(self, backends, routes=None):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = {backend.name: backend for backend in backends}
+        self.routes = routes or {}
+        unknown = {name for names in self.routes.values() for name in names} - set(self.backends)
+        if unknown:
+            raise ValueError(f"Routes name unknown backends: {sorted(unknown)}")
+
+    @classmethod
+    def from_env(cls):
+        """Build from LLM_BACKENDS (JSON list of {name, provider, model, ...}) and LLM_ROUTES (JSON {node: [names]})."""
+        specs = json.loads(os.getenv("LLM_BACKENDS", "null")) or DEFAULT_BACKENDS
+        routes = json.loads(os.getenv("LLM_ROUTES", "null"))
+        if routes is None:
+            names = {spec["name"] for spec in specs}
+            routes = {node: preferred for node, preferred in DEFAULT_ROUTES.items() if set(preferred) <= names}
+        cooldown = float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+        backends = [
+            Backend(spec["name"], build_backend_model(spec), cooldown=cooldown, scheduler=build_backend_scheduler(spec))
+            for spec in specs
+        ]
+        return cls(backends, routes)
+
+    def candidates(self, node=None):
+        """Backends in the order a call from ``node`` tries them."""
+        preferred = [self.backends[name] for name in self.routes.get(node) or self.routes.get("default") or []]
+        others = [backend for backend in self.backends.values() if backend not in preferred]
+
+        def order(group):
+            # Untried backends first, then by latency; tripped circuits go last.
+            return sorted(group, key=lambda b: (not b.healthy(), b.latency is not None, b.latency or 0.0))
+
+        return order(preferred) + order(others)
+
+    def _tag(self, result, backend):
+        message = result.get("raw") if isinstance(result, dict) else result
+        if message is not None and hasattr(message, "response_metadata"):
+            message.response_metadata.setdefault("model_name", backend.model_name)
+            message.response_metadata["backend"] = backend.name
+        return result
+
+    def call(self, fn, prompt_text=""):
+        """Run ``fn(backend)`` on the best backend, failing over on errors."""
+        node, error = current_node(), None
+        for backend in self.candidates(node):
+            started = time.monotonic()
+            try:
+                result = backend.run(fn, prompt_text)
+            except DeadlineExceeded:
+                # The request is out of time, not the backend at fault.
+                raise
+            except Exception as e:
+                if failed_generation(e) is not None:
+                    # The backend answered with a malformed tool call; the caller repairs it.
+                    backend.record_success(time.monotonic() - started)
+                    raise
+                backend.record_failure()
+                ROUTER_CALLS.labels(backend=backend.name, status="error").inc()
+                error = e
+                continue
+            backend.record_success(time.monotonic() - started)
+            ROUTER_CALLS.labels(backend=backend.name, status="ok").inc()
+            return self._tag(result, backend)
+        raise error
+
+    async def acall(self, afn, prompt_text=""):
+        """Async version of :meth:`call`."""
+        node, error = current_node(), None
+        for backend in self.candidates(node):
+            started = time.monotonic()
+            try:
+                result = await backend.arun(afn, prompt_text)
+            except (asyncio.CancelledError, DeadlineExceeded):
+                raise
+            except Exception as e:
+                if failed_generation(e) is not None:
+                    backend.record_success(time.monotonic() - started)
+                    raise
+                backend.record_failure()
+                ROUTER_CALLS.labels(backend=backend.name, status="error").inc()
+                error = e
+                continue
+            backend.record_success(time.monotonic() - started)
+            ROUTER_CALLS.labels(backend=backend.name, status="ok").inc()
+            return self._tag(result, backend)
+        raise error
+
+    def get_llm(self, **kwargs):
+        return RoutedChatModel(router=self)
+
+    def stats(self):
+        return {
+            "routes": self.routes,
+            "backends": {name: backend.stats() for name, backend in self.backends.items()},
+        }
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model facade over an LLMRouter; every call is routed per node."""
+    model_name: str = "router"
+    _router: LLMRouter = PrivateAttr()
+
+    def __init__(self, router, **kwargs):
+        super().__init__(**kwargs)
+        self._router = router
+
+    @property
+    def router(self):
+        return self._router
+
+    @property
+    def _llm_type(self):
+        return "blog-router"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._router.call(
+            lambda backend: backend.model.invoke(messages, _QUIET, stop=stop, **kwargs), _text(messages)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = await self._router.acall(
+            lambda backend: backend.model.ainvoke(messages, _QUIET, stop=stop, **kwargs), _text(messages)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """Stream from the best backend; failover is only possible before the first chunk."""
+        async def first_chunk(backend):
+            stream = backend.model.astream(messages, _QUIET, stop=stop, **kwargs)
+            return stream, await stream.__anext__()
+
+        # A hedged copy would open a second stream that is never closed.
+        with no_hedging():
+            stream, first = await self._router.acall(first_chunk, _text(messages))
+        async for message_chunk in _chain(first, stream):
+            chunk = ChatGenerationChunk(message=message_chunk)
+            if run_manager and message_chunk.content:
+                await run_manager.on_llm_new_token(message_chunk.content, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        """Structured output from whichever backend the router picks for the call."""
+        def invoke(messages):
+            return self._router.call(
+                lambda backend: backend.structured(schema, include_raw).invoke(messages, _QUIET), _text(messages)
+            )
+
+        async def ainvoke(messages):
+            return await self._router.acall(
+                lambda backend: backend.structured(schema, include_raw).ainvoke(messages, _QUIET), _text(messages)
+            )
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"Routed{schema.__name__}")
+
+def _text(messages):
+    """Prompt text of a message list, for the rate limiter's token estimate."""
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+async def _chain(first, rest):
+    yield first
+    async for item in rest:
+        yield item
@@ -0,0 +1,527 @@
+import ast
+import asyncio
+import contextvars
+import datetime
+import email.utils
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from src.monitoring.instrumentation import current_node, record_queue_time
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ReadTimeout"}
+
+# False while the graph runs under a token stream (see no_hedging).
+_hedging = contextvars.ContextVar("blog_hedging", default=True)
+
+# Absolute time.monotonic() by which the request being served must finish.
+_deadline = contextvars.ContextVar("blog_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """The request an LLM call belongs to can no longer finish before its deadline."""
+
+@contextmanager
+def deadline_scope(deadline):
+    """Give every LLM call made inside the block (including graph nodes) an absolute deadline."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+class SharedDeadline:
+    """
+    The deadline of work several requests wait on (see SingleFlight): the
+    latest of theirs, so it is not cut short by whichever request started
+    it. None as soon as one of them has no deadline.
+    """
+
+    def __init__(self, deadline):
+        self._members = [deadline]
+
+    def join(self, deadline):
+        """Add a caller's deadline: a time, None, or another SharedDeadline (nested shared work)."""
+        self._members.append(deadline)
+
+    @property
+    def value(self):
+        values = [m.value if isinstance(m, SharedDeadline) else m for m in self._members]
+        return None if None in values else max(values)
+
+def current_deadline(resolve=True):
+    """
+    The current request's absolute deadline (time.monotonic()), or None. With
+    ``resolve=False`` a SharedDeadline is returned as is, to be joined.
+    """
+    deadline = _deadline.get()
+    return deadline.value if resolve and isinstance(deadline, SharedDeadline) else deadline
+
+def context_with_deadline(deadline):
+    """A copy of the current context in which LLM calls run against ``deadline``."""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, deadline)
+    return context
+
+def time_left():
+    """Seconds until the current request's deadline, or None without one."""
+    deadline = current_deadline()
+    return None if deadline is None else deadline - time.monotonic()
+
+async def within_deadline(awaitable, message):
+    """
+    Await ``awaitable``, cancelling it and raising DeadlineExceeded(``message``)
+    at the request deadline. The deadline is re-read when it passes, since a
+    SharedDeadline may have been pushed back in the meantime.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            left = time_left()
+            if left is None:
+                return await task
+            if left <= 0:
+                raise DeadlineExceeded(message)
+            done, _ = await asyncio.wait({task}, timeout=left)
+            if done:
+                return task.result()
+    finally:
+        task.cancel()
+
+def check_deadline(needed=0.0):
+    """Raise DeadlineExceeded unless ``needed`` more seconds still fit before the deadline."""
+    left = time_left()
+    if left is not None and left <= needed:
+        raise DeadlineExceeded(f"{max(left, 0.0):.1f}s left of the request deadline, {needed:.1f}s needed")
+
+@contextmanager
+def no_hedging():
+    """
+    Never hedge LLM calls made inside the block. For streamed runs: a hedge
+    copy would stream its tokens to the client too, and if it won, the tokens
+    already sent would not match the result.
+    """
+    token = _hedging.set(False)
+    try:
+        yield
+    finally:
+        try:
+            _hedging.reset(token)
+        except ValueError:
+            # An abandoned stream finalised from another context: nothing was set there.
+            pass
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+def _seconds(value, scale=1.0):
+    try:
+        seconds = float(value) * scale
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, seconds) if math.isfinite(seconds) else None
+
+def retry_after(exc):
+    """
+    Seconds the provider asked us to wait, from a Retry-After(-ms) header if
+    present. A header that does not parse is ignored (None), so the caller
+    falls back to its own backoff instead of failing on it.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms") and (seconds := _seconds(headers["retry-after-ms"], 1 / 1000)) is not None:
+        return seconds
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    if (seconds := _seconds(value)) is not None:
+        return seconds
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+    if parsed.tzinfo is None:
+        # HTTP dates are always GMT.
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, parsed.timestamp() - time.time())
+
+def is_retryable(exc):
+    """Rate limits, server errors and transport timeouts are worth retrying."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    return isinstance(exc, TimeoutError) or type(exc).__name__ in RETRYABLE_ERRORS
+
+def _error_body(message):
+    # SDK errors read "Error code: 400 - {'error': {...}}" when no body is attached.
+    start = message.find("{")
+    if start < 0:
+        return None
+    try:
+        return ast.literal_eval(message[start:])
+    except (ValueError, SyntaxError):
+        return None
+
+def failed_generation(exc):
+    """
+    The model output behind a provider rejecting a malformed tool call (Groq's
+    400 ``tool_use_failed``), else None. The model did answer, so that text is
+    worth repairing rather than retrying or failing over.
+    """
+    body = getattr(exc, "body", None)
+    if not isinstance(body, dict):
+        body = _error_body(str(exc))
+    error = body.get("error", body) if isinstance(body, dict) else None
+    if isinstance(error, dict) and error.get("code") == "tool_use_failed":
+        return error.get("failed_generation") or None
+    return None
+
+class TokenBucket:
+    """
+    A bucket of ``capacity`` units refilled continuously at ``rate`` per second.
+    Reservations may overdraw it; the caller then waits for the debt to refill,
+    which queues concurrent callers fairly instead of letting them race.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider."""
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Reserve one request and ``tokens`` tokens; returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.blocked_until - now)
+
+    def settle(self, estimated, actual):
+        """Correct a reservation once the real token usage is known."""
+        with self._lock:
+            self.tokens.refund(estimated - actual)
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. after the provider answered 429."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class SharedRateLimiter:
+    """
+    RateLimiter whose buckets live in a SQLite file, so every process serving
+    the app draws on one provider quota instead of each assuming it has the
+    whole of it. Each reservation is one short IMMEDIATE transaction; buckets
+    are timed with the wall clock, which all processes share.
+    """
+
+    # Calls may wait on another process's transaction: keep them off the event loop.
+    blocking = True
+
+    def __init__(self, path, requests_per_minute=30, tokens_per_minute=6000, name="groq"):
+        self.path = path
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "name TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, "
+            "updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO rate_limits VALUES (?, ?, ?, ?, 0)",
+            (name, requests_per_minute, tokens_per_minute, time.time()),
+        )
+
+    def _update(self, change):
+        """Load both buckets, apply ``change(requests, tokens, blocked_until, now)`` and store them."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated, blocked_until FROM rate_limits WHERE name = ?", (self.name,)
+                ).fetchone()
+                requests = TokenBucket(self.requests_per_minute, self.requests_per_minute / 60)
+                tokens = TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60)
+                requests.level, tokens.level = row[0], row[1]
+                requests.updated = tokens.updated = row[2]
+                now = time.time()
+                result, blocked_until = change(requests, tokens, row[3], now)
+                self._conn.execute(
+                    "UPDATE rate_limits SET requests = ?, tokens = ?, updated = ?, blocked_until = ? WHERE name = ?",
+                    (requests.level, tokens.level, max(requests.updated, tokens.updated), blocked_until, self.name),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def reserve(self, tokens):
+        """Reserve one request and ``tokens`` tokens; returns seconds to wait."""
+        def change(requests, token_bucket, blocked_until, now):
+            wait = max(requests.reserve(1, now), token_bucket.reserve(tokens, now))
+            return max(wait, blocked_until - now), blocked_until
+        return self._update(change)
+
+    def settle(self, estimated, actual):
+        """Correct a reservation once the real token usage is known."""
+        def change(requests, token_bucket, blocked_until, now):
+            token_bucket.refund(estimated - actual)
+            return None, blocked_until
+        self._update(change)
+
+    def pause(self, seconds):
+        """Hold every caller in every process back, e.g. after the provider answered 429."""
+        def change(requests, token_bucket, blocked_until, now):
+            return None, max(blocked_until, now + seconds)
+        self._update(change)
+
+class CallScheduler:
+    """
+    Wraps every LLM call in the process: waits for the rate limiter, retries
+    retryable failures with exponential backoff and full jitter (honouring
+    Retry-After), and for async calls hedges a request that is still running
+    past the recent latency percentile by racing a second copy. Latencies
+    are tracked per graph node, since a title and a full structuring call
+    take very different times. Under a request deadline, a call whose rate-limit wait or backoff would not
+    leave time for a typical call is abandoned with DeadlineExceeded instead.
+    """
+
+    def __init__(self, limiter=None, max_retries=5, base_delay=0.5, max_delay=30.0,
+                 hedge_percentile=0.95, hedge_min_samples=20, completion_tokens=1024):
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.completion_tokens = completion_tokens
+        # Recent latencies per call kind (the graph node making the call).
+        self.latencies = {}
+        self._lock = threading.Lock()
+        self.metrics = {"calls": 0, "retries": 0, "rate_limited": 0, "hedges": 0, "hedge_wins": 0, "throttled_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, name="groq", requests_per_minute=None, tokens_per_minute=None, max_retries=None):
+        """
+        Build a scheduler from GROQ_RPM / GROQ_TPM / LLM_* environment variables;
+        arguments override them, e.g. for one of several router backends. With
+        LLM_RATE_LIMIT_DB set, the limits for ``name`` are shared by every
+        process using that file.
+        """
+        limits = {
+            "requests_per_minute": int(requests_per_minute or os.getenv("GROQ_RPM", "30")),
+            "tokens_per_minute": int(tokens_per_minute or os.getenv("GROQ_TPM", "6000")),
+        }
+        if os.getenv("LLM_RATE_LIMIT_DB"):
+            limiter = SharedRateLimiter(os.getenv("LLM_RATE_LIMIT_DB"), name=name, **limits)
+        else:
+            limiter = RateLimiter(**limits)
+        return cls(
+            limiter=limiter,
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")) if max_retries is None else max_retries,
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        )
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    @staticmethod
+    def _kind():
+        return current_node() or "other"
+
+    def _hedge_after(self, kind=None):
+        """Latency after which a second copy of a ``kind`` call is started, if known yet."""
+        with self._lock:
+            latencies = self.latencies.get(kind or self._kind(), ())
+            if self.hedge_percentile is None or len(latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+
+    def _backoff(self, attempt, exc):
+        """Seconds to wait before a retry, and the provider's Retry-After to pause the limiter for, if any."""
+        wait = retry_after(exc)
+        if wait is None:
+            return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)), None
+        self._count("rate_limited")
+        return wait + random.uniform(0, self.base_delay), wait
+
+    def _given_up(self, exc):
+        """
+        A Retry-After on a call that will not be retried here (e.g. the router
+        fails over instead) still holds later calls back; returns the pause.
+        """
+        wait = retry_after(exc)
+        if wait is not None:
+            self._count("rate_limited")
+        return wait
+
+    async def _alimiter(self, method, *args):
+        """Call a limiter method from async code; a blocking (SQLite) limiter runs in a worker thread."""
+        if getattr(self.limiter, "blocking", False):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _typical_latency(self):
+        with self._lock:
+            latencies = self.latencies.get(self._kind())
+            return sorted(latencies)[len(latencies) // 2] if latencies else 0.0
+
+    def _throttled(self, wait):
+        if wait > 0:
+            self._count("throttled_seconds", wait)
+            record_queue_time(wait)
+        return wait
+
+    def _reserve(self, tokens):
+        wait = self.limiter.reserve(tokens)
+        try:
+            check_deadline(wait + self._typical_latency())
+        except DeadlineExceeded:
+            # The call is not made, so its tokens go back to the bucket.
+            self.limiter.settle(tokens, 0)
+            raise
+        return self._throttled(wait)
+
+    async def _areserve(self, tokens):
+        """Async version of :meth:`_reserve`."""
+        wait = await self._alimiter(self.limiter.reserve, tokens)
+        try:
+            check_deadline(wait + self._typical_latency())
+        except DeadlineExceeded:
+            await self._alimiter(self.limiter.settle, tokens, 0)
+            raise
+        return self._throttled(wait)
+
+    def _record(self, started, result):
+        """Note the call's latency; returns the tokens it really used, when the provider reports them."""
+        with self._lock:
+            latencies = self.latencies.setdefault(self._kind(), deque(maxlen=200))
+            latencies.append(time.monotonic() - started)
+        message = result.get("raw") if isinstance(result, dict) else result
+        usage = getattr(message, "usage_metadata", None)
+        return usage.get("total_tokens") if usage else None
+
+    def call(self, fn, prompt_text=""):
+        """Run a blocking LLM call under the limiter and retry policy."""
+        tokens = estimate_tokens(prompt_text) + self.completion_tokens
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._reserve(tokens))
+            self._count("calls")
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    if (pause := self._given_up(e)) is not None:
+                        self.limiter.pause(pause)
+                    raise
+                self._count("retries")
+                delay, pause = self._backoff(attempt, e)
+                if pause is not None:
+                    self.limiter.pause(pause)
+                check_deadline(delay + self._typical_latency())
+                time.sleep(delay)
+                continue
+            if (used := self._record(started, result)) is not None:
+                self.limiter.settle(tokens, used)
+            return result
+
+    async def _hedged(self, afn, tokens):
+        hedge_after = self._hedge_after() if _hedging.get() else None
+        if hedge_after is None:
+            return await afn()
+
+        first = asyncio.ensure_future(afn())
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return first.result()
+
+            try:
+                wait = await self._areserve(tokens)
+            except DeadlineExceeded:
+                # No time left for a second copy; keep waiting on the first.
+                return await first
+            self._count("hedges")
+            await asyncio.sleep(wait)
+            if first.done() and first.exception() is None:
+                return first.result()
+            second = asyncio.ensure_future(afn())
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, afn, prompt_text=""):
+        """Async version of :meth:`call`, with request hedging."""
+        tokens = estimate_tokens(prompt_text) + self.completion_tokens
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(await self._areserve(tokens))
+            self._count("calls")
+            started = time.monotonic()
+            try:
+                result = await self._hedged(afn, tokens)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    if (pause := self._given_up(e)) is not None:
+                        await self._alimiter(self.limiter.pause, pause)
+                    raise
+                self._count("retries")
+                delay, pause = self._backoff(attempt, e)
+                if pause is not None:
+                    await self._alimiter(self.limiter.pause, pause)
+                check_deadline(delay + self._typical_latency())
+                await asyncio.sleep(delay)
+                continue
+            if (used := self._record(started, result)) is not None:
+                await self._alimiter(self.limiter.settle, tokens, used)
+            return result
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        with self._lock:
+            kinds = list(self.latencies)
+        return {**metrics, "hedge_after": {kind: self._hedge_after(kind) for kind in kinds}}
@@ -0,0 +1,192 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Histogram
+
+# USD per million tokens (input, output); override with LLM_PRICE_INPUT / LLM_PRICE_OUTPUT.
+MODEL_PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+NODE_DURATION = Histogram("blog_node_duration_seconds", "Wall time spent in a graph node.", ["node"])
+NODE_QUEUE = Histogram("blog_node_queue_seconds", "Time a graph node spent waiting for LLM capacity.", ["node"])
+NODE_CALLS = Counter("blog_node_calls_total", "Graph node executions.", ["node", "status"])
+LLM_TOKENS = Counter("blog_llm_tokens_total", "LLM tokens used, by node.", ["node", "kind"])
+LLM_COST = Counter("blog_llm_cost_usd_total", "Estimated LLM spend in USD, by node.", ["node"])
+REQUEST_DURATION = Histogram("blog_request_duration_seconds", "End-to-end generation time.", ["endpoint"])
+REQUEST_QUEUE = Histogram("blog_request_queue_seconds", "Time a request waited for a generation slot.", ["endpoint"])
+PROMPT_TOKENS = Histogram(
+    "blog_prompt_tokens", "Estimated size of each prompt sent, by node.", ["node"],
+    buckets=(100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+BUDGET_DECISIONS = Counter("blog_budget_decisions_total", "What the prompt budget did with a draft.", ["decision"])
+ROUTER_CALLS = Counter("blog_router_calls_total", "LLM calls made by the router, by backend.", ["backend", "status"])
+COALESCED_CALLS = Counter(
+    "blog_coalesced_calls_total", "Calls served by an identical call already in flight.", ["level"]
+)
+TEMPLATE_PROMPT_TOKENS = Counter(
+    "blog_template_prompt_tokens_total",
+    "Estimated prompt tokens sent per template; 'static' is the cacheable system prefix.", ["template", "part"],
+)
+TEMPLATE_CALL_SECONDS = Histogram("blog_template_call_seconds", "LLM call latency by prompt template.", ["template"])
+ADMISSIONS = Counter(
+    "blog_admissions_total", "Generation requests admitted or rejected by admission control.", ["outcome"]
+)
+STRUCTURED_REPAIRS = Counter(
+    "blog_structured_repairs_total", "Malformed structured outputs repaired locally or completed by a follow-up call.",
+    ["schema", "outcome"],
+)
+SEMANTIC_LOOKUPS = Counter("blog_semantic_cache_lookups_total", "Semantic draft cache lookups.", ["result"])
+SEMANTIC_LOOKUP_SECONDS = Histogram(
+    "blog_semantic_cache_lookup_seconds", "Time to embed a topic and search the semantic cache.",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+_trace = ContextVar("blog_trace", default=None)
+_span = ContextVar("blog_span", default=None)
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call."""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    input_price = float(os.getenv("LLM_PRICE_INPUT", input_price))
+    output_price = float(os.getenv("LLM_PRICE_OUTPUT", output_price))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+class Span:
+    """Timings and LLM usage of one node execution."""
+
+    def __init__(self, node):
+        self.node = node
+        self.wall = 0.0
+        self.queue = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def as_dict(self):
+        return {
+            "node": self.node,
+            "wall_ms": round(self.wall * 1000, 1),
+            "queue_ms": round(self.queue * 1000, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost, 8),
+        }
+
+class RequestTrace:
+    """Per-request collection of node spans, returned with the response."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queue = 0.0
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        with self._lock:
+            spans = [span.as_dict() for span in self.spans]
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "queue_ms": round(self.queue * 1000, 1),
+            "prompt_tokens": sum(span["prompt_tokens"] for span in spans),
+            "completion_tokens": sum(span["completion_tokens"] for span in spans),
+            "cost_usd": round(sum(span["cost_usd"] for span in spans), 8),
+            "nodes": spans,
+        }
+
+@contextmanager
+def trace_request(endpoint):
+    """Collect node spans for everything run inside the block."""
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - trace.started)
+        REQUEST_QUEUE.labels(endpoint).observe(trace.queue)
+
+def current_node():
+    """Name of the graph node running in this context, if any."""
+    span = _span.get()
+    return span.node if span is not None else None
+
+def record_queue_time(seconds):
+    """Called by the LLM scheduler when a call has to wait for capacity."""
+    span = _span.get()
+    if span is not None:
+        span.queue += seconds
+
+def record_prompt_size(tokens):
+    """Record the estimated size of a prompt about to be sent; returns the node name."""
+    span = _span.get()
+    node = span.node if span is not None else "unknown"
+    PROMPT_TOKENS.labels(node).observe(tokens)
+    return node
+
+def record_llm_usage(model, message):
+    """Attribute token usage from an AIMessage's usage metadata to the current node."""
+    usage = getattr(message, "usage_metadata", None)
+    span = _span.get()
+    if not usage or span is None:
+        return
+    # Routed calls say which model actually served them.
+    model = (getattr(message, "response_metadata", None) or {}).get("model_name") or model
+    prompt_tokens = usage.get("input_tokens", 0)
+    completion_tokens = usage.get("output_tokens", 0)
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    span.prompt_tokens += prompt_tokens
+    span.completion_tokens += completion_tokens
+    span.cost += cost
+    LLM_TOKENS.labels(span.node, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(span.node, "completion").inc(completion_tokens)
+    LLM_COST.labels(span.node).inc(cost)
+
+def _finish(span, started, status):
+    span.wall = time.perf_counter() - started
+    NODE_DURATION.labels(span.node).observe(span.wall)
+    NODE_QUEUE.labels(span.node).observe(span.queue)
+    NODE_CALLS.labels(span.node, status).inc()
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(span)
+
+def instrument_node(name, fn):
+    """Wrap a graph node (sync or async) so each execution records a span."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            span, started, status = Span(name), time.perf_counter(), "ok"
+            token = _span.set(span)
+            try:
+                return await fn(state)
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                _span.reset(token)
+                _finish(span, started, status)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        span, started, status = Span(name), time.perf_counter(), "ok"
+        token = _span.set(span)
+        try:
+            return fn(state)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            _span.reset(token)
+            _finish(span, started, status)
+    return wrapper
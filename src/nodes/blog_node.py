@@ -1,67 +1,517 @@
-from src.states.blogstate import BlogState, Blog
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.states.blogstate import BlogState, Blog, BlogSection, BlogOverview
+from src.nodes.sections import split_markdown_sections
+from src.nodes.budget import PromptBudget
+from src.nodes.prompts import (
+    PromptMessages, TITLE, CONTENT, STRUCTURE, SECTION, OVERVIEW, REGENERATE_SECTION, REMAINDER,
+)
+from src.nodes.repair import PartialOutput, repair_structured, remainder_schema, merge_remainder, describe_kept
+from src.monitoring.instrumentation import record_llm_usage, STRUCTURED_REPAIRS
+from src.cache.response_cache import ResponseCache
+from src.cache.single_flight import SingleFlight
+from src.llms.throttling import check_deadline, failed_generation, within_deadline
 from langchain_core.messages import HumanMessage
+from langgraph.types import Send
+
+logger = logging.getLogger(__name__)
+
+# Neighbouring sections are context only; this bounds what they add to the prompt.
+NEIGHBOUR_CHARS = 1500
+
+def find_section(blog, index=None, title=None):
+    """Position of a section chosen by index or (case-insensitive) title."""
+    if index is not None:
+        # Indexes arrive from JSON bodies: accept 2 or "2", reject anything else with a ValueError.
+        if isinstance(index, bool) or not isinstance(index, (int, str)) or not str(index).strip().lstrip("-").isdigit():
+            raise ValueError(f"Section index must be an integer, got {index!r}")
+        index = int(index)
+        if not 0 <= index < len(blog.sections):
+            raise IndexError(f"Section index {index} out of range (blog has {len(blog.sections)} sections)")
+        return index
+    if title is not None:
+        if not isinstance(title, str):
+            raise ValueError(f"Section title must be a string, got {title!r}")
+        for position, section in enumerate(blog.sections):
+            if section.title.strip().lower() == title.strip().lower():
+                return position
+        raise KeyError(f"No section titled {title!r}")
+    raise ValueError("Pass a section index or title")
 
 class BlogNode:
     """
     A class to represent the blog node with distinct methods for each path.
+    Every LLM-calling node has an async twin (prefixed with ``a``) that uses
+    ``ainvoke`` so the API server never blocks its event loop. All LLM calls
+    go through the ``_generate_*`` helpers, which consult the optional
+    response cache first and run misses through the optional call scheduler
+    (rate limiting, retries and hedging). The optional semantic cache lets
+    near-duplicate topics share one draft, and ``single_flight`` (shared
+    across graphs by the registry) collapses identical concurrent calls.
+    ``budget`` measures every prompt and keeps drafts sent back for
+    structuring within a token budget. Prompts come from the templates in
+    ``prompts.py`` (static system prefix first, request text last), whose
+    versions are part of every cache key. Malformed structured output is
+    repaired locally, and only the fields that could not be salvaged are
+    asked for again.
     """
-    def __init__(self, llm):
+    def __init__(self, llm, cache=None, scheduler=None, semantic_cache=None, single_flight=None, budget=None):
         self.llm = llm
+        self.cache = cache
+        self.scheduler = scheduler
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight or SingleFlight("llm")
+        self.budget = budget or PromptBudget.from_env()
+
+    def _model_name(self):
+        """Name of the underlying model, used to key cached responses."""
+        return getattr(self.llm, "model_name", None) or type(self.llm).__name__
+
+    @staticmethod
+    def _render(messages):
+        """Flatten a prompt (string or message list) into the text we hash."""
+        if isinstance(messages, str):
+            return messages
+        return "\n".join(str(message.content) for message in messages)
+
+    def _cache_key(self, prompt, language, kind):
+        # Templated prompts carry their version, so an edited template never hits old entries.
+        template = getattr(prompt, "template", None)
+        if template is not None:
+            kind = f"{kind}@{template.version}"
+        return ResponseCache.make_key(self._model_name(), self._render(prompt), language, kind)
+
+    @staticmethod
+    def _raw_message(result):
+        """The AIMessage behind a result (structured calls are made with include_raw)."""
+        return result.get("raw") if isinstance(result, dict) else result
+
+    @staticmethod
+    def _parsed(schema, result):
+        """
+        Unpack an include_raw structured result. Output the provider could not
+        parse is repaired locally from the raw message; raises PartialOutput
+        when only part of it could be salvaged.
+        """
+        if not isinstance(result, dict):
+            return result
+        if result.get("parsed") is None:
+            return repair_structured(schema, result.get("raw"), result.get("parsing_error"))
+        return result["parsed"]
+
+    def _invoke_structured(self, schema, messages):
+        """
+        One structured call, unpacked with :meth:`_parsed`. A tool call the
+        provider rejected as malformed (Groq's tool_use_failed) is repaired
+        from the output it carries instead of failing the node.
+        """
+        structured_llm = self.llm.with_structured_output(schema, include_raw=True)
+        try:
+            result = self._invoke(structured_llm, messages)
+        except Exception as e:
+            if (text := failed_generation(e)) is None:
+                raise
+            return repair_structured(schema, text, e)
+        return self._parsed(schema, result)
+
+    async def _ainvoke_structured(self, schema, messages):
+        """Async version of :meth:`_invoke_structured`."""
+        structured_llm = self.llm.with_structured_output(schema, include_raw=True)
+        try:
+            result = await self._ainvoke(structured_llm, messages)
+        except Exception as e:
+            if (text := failed_generation(e)) is None:
+                raise
+            return repair_structured(schema, text, e)
+        return self._parsed(schema, result)
+
+    def _remainder_messages(self, partial, messages):
+        """The original prompt plus a request for just the missing fields."""
+        follow_up = HumanMessage(content=REMAINDER.render_user(
+            kept=describe_kept(partial), missing=", ".join(partial.missing)))
+        return PromptMessages(list(messages) + [follow_up], REMAINDER)
+
+    def _complete(self, partial, messages):
+        """Ask the model only for what a partial structured output is missing."""
+        schema = remainder_schema(partial.schema, tuple(partial.missing))
+        try:
+            remainder = self._invoke_structured(schema, self._remainder_messages(partial, messages))
+        except ValueError:
+            STRUCTURED_REPAIRS.labels(schema=partial.schema.__name__, outcome="failed").inc()
+            raise
+        STRUCTURED_REPAIRS.labels(schema=partial.schema.__name__, outcome="reprompted").inc()
+        return merge_remainder(partial, remainder)
+
+    async def _acomplete(self, partial, messages):
+        """Async version of :meth:`_complete`."""
+        schema = remainder_schema(partial.schema, tuple(partial.missing))
+        try:
+            remainder = await self._ainvoke_structured(schema, self._remainder_messages(partial, messages))
+        except ValueError:
+            STRUCTURED_REPAIRS.labels(schema=partial.schema.__name__, outcome="failed").inc()
+            raise
+        STRUCTURED_REPAIRS.labels(schema=partial.schema.__name__, outcome="reprompted").inc()
+        return merge_remainder(partial, remainder)
+
+    @staticmethod
+    def _record_template(prompt, tokens, started):
+        template = getattr(prompt, "template", None)
+        if template is not None:
+            template.record(tokens, time.perf_counter() - started)
+
+    def _invoke(self, runnable, prompt):
+        """
+        Invoke a runnable, through the scheduler when one is configured. No call
+        is started once the request's deadline has passed.
+        """
+        check_deadline()
+        tokens = self.budget.measure(self._render(prompt))
+        started = time.perf_counter()
+        if self.scheduler is None:
+            result = runnable.invoke(prompt)
+        else:
+            result = self.scheduler.call(lambda: runnable.invoke(prompt), self._render(prompt))
+        self._record_template(prompt, tokens, started)
+        record_llm_usage(self._model_name(), self._raw_message(result))
+        return result
+
+    async def _ainvoke(self, runnable, prompt):
+        """Async version of :meth:`_invoke`; the call is also cut off at the deadline."""
+        check_deadline()
+        tokens = self.budget.measure(self._render(prompt))
+        started = time.perf_counter()
+        if self.scheduler is None:
+            call = runnable.ainvoke(prompt)
+        else:
+            call = self.scheduler.acall(lambda: runnable.ainvoke(prompt), self._render(prompt))
+        result = await within_deadline(call, "LLM call still running at the request deadline")
+        self._record_template(prompt, tokens, started)
+        record_llm_usage(self._model_name(), self._raw_message(result))
+        return result
+
+    def _generate_text(self, prompt, language=""):
+        """
+        Invoke the LLM for plain text, going through the cache. Identical
+        prompts already in flight are joined instead of sent again.
+        """
+        key = self._cache_key(prompt, language, "text")
+        if self.cache and (cached := self.cache.get(key)) is not None:
+            return cached
+
+        def call():
+            text = self._invoke(self.llm, prompt).content
+            if self.cache:
+                self.cache.set(key, text)
+            return text
+
+        return self.single_flight.do(key, call)
+
+    async def _agenerate_text(self, prompt, language=""):
+        """Async version of :meth:`_generate_text`."""
+        key = self._cache_key(prompt, language, "text")
+        if self.cache and (cached := await self.cache.aget(key)) is not None:
+            return cached
+
+        async def call():
+            text = (await self._ainvoke(self.llm, prompt)).content
+            if self.cache:
+                await self.cache.aset(key, text)
+            return text
+
+        return await self.single_flight.ado(key, call)
+
+    def _generate_structured(self, schema, messages, language="", cached=True):
+        """
+        Invoke the LLM for a pydantic ``schema``, going through the cache and
+        single flight. ``cached=False`` always asks the model for a fresh answer.
+        """
+        key = self._cache_key(messages, language, schema.__name__)
+        cache = self.cache if cached else None
+        if cache and (hit := cache.get(key)) is not None:
+            return schema.model_validate(hit)
+
+        def call():
+            try:
+                result = self._invoke_structured(schema, messages)
+            except PartialOutput as partial:
+                result = self._complete(partial, messages)
+            if cache:
+                cache.set(key, result.model_dump())
+            return result
+
+        # Followers get their own copy so callers never share a mutable model.
+        return self.single_flight.do(key, call).model_copy(deep=True)
+
+    async def _agenerate_structured(self, schema, messages, language="", cached=True):
+        """Async version of :meth:`_generate_structured`."""
+        key = self._cache_key(messages, language, schema.__name__)
+        cache = self.cache if cached else None
+        if cache and (hit := await cache.aget(key)) is not None:
+            return schema.model_validate(hit)
+
+        async def call():
+            try:
+                result = await self._ainvoke_structured(schema, messages)
+            except PartialOutput as partial:
+                result = await self._acomplete(partial, messages)
+            if cache:
+                await cache.aset(key, result.model_dump())
+            return result
+
+        return (await self.single_flight.ado(key, call)).model_copy(deep=True)
 
     def title_creation(self, state: BlogState):
         """Create a base title for the blog."""
-        prompt = "Generate a creative and SEO-friendly blog title for the topic: {topic}."
-        response = self.llm.invoke(prompt.format(topic=state['topic']))
-        return {"blog": {"title": response.content, "content": ""}}
+        title = self._generate_text(TITLE.messages(topic=state['topic']))
+        return {"blog": {"title": title}}
+
+    async def atitle_creation(self, state: BlogState):
+        """Async version of :meth:`title_creation`."""
+        title = await self._agenerate_text(TITLE.messages(topic=state['topic']))
+        return {"blog": {"title": title}}
+
+    def _draft_namespace(self):
+        """Semantic cache namespace: drafts are only shared between the same model and content prompt."""
+        return f"{self._model_name()}@{CONTENT.version}"
+
+    def _similar_draft(self, topic):
+        """A draft written for a near-duplicate topic, if the semantic cache has one."""
+        if self.semantic_cache is None:
+            return None
+        match = self.semantic_cache.lookup(self._draft_namespace(), topic)
+        return match[0] if match else None
+
+    def _remember_draft(self, topic, content):
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(self._draft_namespace(), topic, content)
+
+    async def _asimilar_draft(self, topic):
+        """Async version of :meth:`_similar_draft`."""
+        if self.semantic_cache is None:
+            return None
+        match = await self.semantic_cache.alookup(self._draft_namespace(), topic)
+        return match[0] if match else None
+
+    async def _aremember_draft(self, topic, content):
+        if self.semantic_cache is not None:
+            await self.semantic_cache.aadd(self._draft_namespace(), topic, content)
 
     def content_generation(self, state: BlogState):
-        """Generate the main, unstructured content for the blog."""
-        prompt = "You are an expert blog writer. Generate a detailed blog content with a breakdown for the topic: {topic}."
-        response = self.llm.invoke(prompt.format(topic=state["topic"]))
-        return {"blog": {"title": state['blog']['title'], "content": response.content}}
+        """
+        Generate the main, unstructured content for the blog. Only depends on the
+        topic, so it runs alongside title_creation and the reducer merges both.
+        The draft is language neutral, so near-duplicate topics reuse one and
+        only the structuring step runs again for the requested language.
+        """
+        content = self._similar_draft(state["topic"])
+        if content is None:
+            content = self._generate_text(CONTENT.messages(topic=state["topic"]))
+            self._remember_draft(state["topic"], content)
+        return {"blog": {"content": content}}
+
+    async def acontent_generation(self, state: BlogState):
+        """Async version of :meth:`content_generation`."""
+        content = await self._asimilar_draft(state["topic"])
+        if content is None:
+            content = await self._agenerate_text(CONTENT.messages(topic=state["topic"]))
+            await self._aremember_draft(state["topic"], content)
+        return {"blog": {"content": content}}
+
+    def _structure_messages(self, state: BlogState, language: str):
+        """Build the translate-and-structure prompt for a given language."""
+        return STRUCTURE.messages(
+            language=language,
+            blog_title=state["blog"]["title"],
+            blog_content=state["blog"]["content"]
+        )
+
+    def _fit_draft(self, state: BlogState):
+        """Apply the prompt budget: a long draft is compacted or switched to section mode."""
+        draft = state["blog"]["content"]
+        fitted, structuring = self.budget.fit(draft, state.get("structuring", "single"))
+        if fitted is draft and structuring == state.get("structuring", "single"):
+            return state
+        return {**state, "structuring": structuring, "blog": {**state["blog"], "content": fitted}}
 
     def _structure_content(self, state: BlogState, language: str):
-        """A helper function to structure content for a given language."""
-        prompt = """
-        You are an expert content writer and translator.
-        Your task is to take the following blog content, translate it into {language},
-        and then structure it into a complete blog format.
-
-        You MUST structure your output into a JSON object with a 'main_title', an 'introduction',
-        and a list of 'sections', where each section has its own 'title' and 'content'.
-
-        ORIGINAL CONTENT:
-        Title: {blog_title}
-        Content: {blog_content}
-        """
-        messages = [
-            HumanMessage(
-                content=prompt.format(
-                    language=language,
-                    blog_title=state["blog"]["title"],
-                    blog_content=state["blog"]["content"]
-                )
-            )
-        ]
-        structured_blog = self.llm.with_structured_output(Blog).invoke(messages)
+        """
+        A helper function to structure content for a given language. With
+        state['structuring'] == "sections" the draft is split on its headings
+        and each chunk is structured concurrently instead of in one big call.
+        Drafts over the token budget are compacted or chunked first.
+        """
+        state = self._fit_draft(state)
+        if state.get("structuring") == "sections":
+            return self._structure_sections(state, language)
+        messages = self._structure_messages(state, language)
+        structured_blog = self._generate_structured(Blog, messages, language)
         return {"blog": structured_blog.model_dump()}
 
+    async def _astructure_content(self, state: BlogState, language: str):
+        """Async version of :meth:`_structure_content`."""
+        state = self._fit_draft(state)
+        if state.get("structuring") == "sections":
+            return await self._astructure_sections(state, language)
+        messages = self._structure_messages(state, language)
+        structured_blog = await self._agenerate_structured(Blog, messages, language)
+        return {"blog": structured_blog.model_dump()}
+
+    def _section_jobs(self, state: BlogState, language: str):
+        """
+        Split the draft and build one prompt per chunk, plus the overview prompt.
+        The overview only needs the headings, so it runs alongside the sections.
+        """
+        title = state["blog"]["title"]
+        preamble, chunks = split_markdown_sections(state["blog"]["content"])
+        section_prompts = [
+            SECTION.messages(language=language, blog_title=title, heading=heading or "(none)", content=body)
+            for heading, body in chunks
+        ]
+        overview_prompt = OVERVIEW.messages(
+            language=language,
+            blog_title=title,
+            headings="; ".join(heading for heading, _ in chunks if heading) or "(none)",
+            preamble=preamble[:1500] or "(none)")
+        return section_prompts, overview_prompt
+
+    @staticmethod
+    def _assemble(overview, sections):
+        return {"blog": Blog(
+            main_title=overview.main_title,
+            introduction=overview.introduction,
+            sections=sections,
+        ).model_dump()}
+
+    def _structure_sections(self, state: BlogState, language: str):
+        """Section-parallel structuring: one small call per chunk, run concurrently."""
+        section_prompts, overview_prompt = self._section_jobs(state, language)
+        with ThreadPoolExecutor(max_workers=len(section_prompts) + 1) as pool:
+            # Copy the context into each thread so usage is attributed to this node.
+            overview = pool.submit(
+                contextvars.copy_context().run, self._generate_structured, BlogOverview, overview_prompt, language)
+            sections = [
+                pool.submit(contextvars.copy_context().run, self._generate_structured, BlogSection, prompt, language)
+                for prompt in section_prompts
+            ]
+            sections = [section.result() for section in sections]
+        return self._assemble(overview.result(), sections)
+
+    async def _astructure_sections(self, state: BlogState, language: str):
+        """Async version of :meth:`_structure_sections`."""
+        section_prompts, overview_prompt = self._section_jobs(state, language)
+        overview, *sections = await asyncio.gather(
+            self._agenerate_structured(BlogOverview, overview_prompt, language),
+            *(self._agenerate_structured(BlogSection, prompt, language) for prompt in section_prompts),
+        )
+        return self._assemble(overview, sections)
+
     def english_structuring(self, state: BlogState):
         """Node to structure the content in English."""
-        print("Executing English structuring node.")
+        logger.info("Executing English structuring node.")
         return self._structure_content(state, "English")
 
+    async def aenglish_structuring(self, state: BlogState):
+        """Async node to structure the content in English."""
+        logger.info("Executing English structuring node.")
+        return await self._astructure_content(state, "English")
+
     def german_translation(self, state: BlogState):
         """Node to translate and structure the content in German."""
-        print("Executing German translation node.")
+        logger.info("Executing German translation node.")
         return self._structure_content(state, "German")
 
+    async def agerman_translation(self, state: BlogState):
+        """Async node to translate and structure the content in German."""
+        logger.info("Executing German translation node.")
+        return await self._astructure_content(state, "German")
+
+    def structure_language(self, state: BlogState):
+        """Fan-out node: structure the shared draft for one of the requested languages."""
+        language = state["current_language"]
+        logger.info("Executing %s structuring node.", language)
+        result = self._structure_content(state, language.title())
+        return {"blogs": {language: result["blog"]}}
+
+    async def astructure_language(self, state: BlogState):
+        """Async version of :meth:`structure_language`."""
+        language = state["current_language"]
+        logger.info("Executing %s structuring node.", language)
+        result = await self._astructure_content(state, language.title())
+        return {"blogs": {language: result["blog"]}}
+
+    @staticmethod
+    def _neighbour(blog, position):
+        if not 0 <= position < len(blog.sections):
+            return "(none)"
+        section = blog.sections[position]
+        return f"{section.title}\n{section.content[:NEIGHBOUR_CHARS]}"
+
+    def _regenerate_messages(self, state, blog, position):
+        section = blog.sections[position]
+        instructions = state.get("instructions")
+        return REGENERATE_SECTION.messages(
+            language=state.get("current_language", "english").title(),
+            instructions=f"EDITOR NOTES: {instructions}" if instructions else "",
+            blog_title=blog.main_title,
+            introduction=blog.introduction,
+            previous=self._neighbour(blog, position - 1),
+            heading=section.title,
+            content=section.content,
+            next=self._neighbour(blog, position + 1),
+        )
+
+    @staticmethod
+    def _patch(blog, position, section):
+        sections = list(blog.sections)
+        sections[position] = section
+        return {"blog": blog.model_copy(update={"sections": sections}).model_dump(), "section_index": position}
+
+    def regenerate_section(self, state):
+        """
+        Rewrite one section of an existing blog (state: 'blog', 'section_index'
+        or 'section_title', 'current_language', optional 'instructions') with
+        its neighbours as context. One small LLM call, never served from the
+        cache since the point is a new version; the other sections are kept.
+        """
+        blog = Blog.model_validate(state["blog"])
+        position = find_section(blog, state.get("section_index"), state.get("section_title"))
+        messages = self._regenerate_messages(state, blog, position)
+        section = self._generate_structured(BlogSection, messages, state.get("current_language", ""), cached=False)
+        return self._patch(blog, position, section)
+
+    async def aregenerate_section(self, state):
+        """Async version of :meth:`regenerate_section`."""
+        blog = Blog.model_validate(state["blog"])
+        position = find_section(blog, state.get("section_index"), state.get("section_title"))
+        messages = self._regenerate_messages(state, blog, position)
+        section = await self._agenerate_structured(
+            BlogSection, messages, state.get("current_language", ""), cached=False
+        )
+        return self._patch(blog, position, section)
+
     def route(self, state: BlogState):
         """This node simply passes the state to the conditional router."""
         return state
 
     def route_decision(self, state: BlogState):
-        """Determines the next step based on the selected language."""
+        """
+        Determines the next step based on the selected language. A list of
+        'languages' fans the single draft out to one structuring task per
+        language, all running concurrently.
+        """
+        if state.get("languages"):
+            return [
+                Send("structure_language", {
+                    "topic": state["topic"],
+                    "blog": state["blog"],
+                    "current_language": language,
+                    "structuring": state.get("structuring", "single"),
+                })
+                for language in state["languages"]
+            ]
         if state.get("current_language", "").lower() == "german":
             return "german"
         return "english"
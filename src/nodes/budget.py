@@ -0,0 +1,121 @@
+import logging
+import os
+import re
+from src.llms.throttling import estimate_tokens
+from src.monitoring.instrumentation import record_prompt_size, BUDGET_DECISIONS
+from src.nodes.sections import split_markdown_sections
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def normalize_draft(text):
+    """Lossless-in-meaning cleanup: collapse whitespace and drop repeated paragraphs."""
+    seen, paragraphs = set(), []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = "\n".join(re.sub(r"[ \t]+", " ", line).strip() for line in paragraph.strip().splitlines())
+        key = paragraph.lower()
+        if paragraph and key not in seen:
+            seen.add(key)
+            paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+def _lead(text, max_tokens, counter):
+    """The leading sentences of ``text`` that fit in ``max_tokens``, cut mid-sentence only if the first is too long."""
+    kept, used = [], 0
+    for sentence in SENTENCE_END.split(text):
+        cost = counter(sentence)
+        if used + cost > max_tokens:
+            if not kept:
+                words = sentence.split()
+                kept.append(" ".join(words[:max(1, len(words) * max_tokens // cost)]) + " ...")
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+def compact_draft(text, max_tokens, counter=estimate_tokens):
+    """
+    Shrink a markdown draft to about ``max_tokens`` without another LLM call:
+    normalise it, then keep every heading and the lead sentences of each
+    section, sharing the budget in proportion to section length.
+    """
+    text = normalize_draft(text)
+    total = counter(text)
+    if total <= max_tokens:
+        return text
+    preamble, sections = split_markdown_sections(text, max_chars=len(text) + 1)
+    parts = [("", preamble)] if preamble else []
+    parts += sections
+    ratio = max_tokens / total
+    compacted = []
+    for heading, body in parts:
+        body = _lead(body, max(20, int(counter(body) * ratio)), counter)
+        compacted.append(f"## {heading}\n{body}" if heading else body)
+    return "\n\n".join(compacted)
+
+class PromptBudget:
+    """
+    Token budget for the prompts BlogNode builds. Every prompt sent is
+    measured (``blog_prompt_tokens`` per node) and flagged when it exceeds
+    ``max_prompt_tokens``. Before structuring, a draft longer than
+    ``max_draft_tokens`` is either compacted in place or chunked into
+    section-parallel structuring, per ``strategy``:
+
+    - "compact": always compact to the budget,
+    - "chunk": always switch to section mode (each prompt holds one chunk),
+    - "auto": chunk drafts more than twice the budget, compact the rest,
+    - "off": measure only.
+    """
+    STRATEGIES = ("auto", "compact", "chunk", "off")
+
+    def __init__(self, max_draft_tokens=2500, max_prompt_tokens=4000, strategy="auto", counter=estimate_tokens):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown budget strategy {strategy!r}; expected one of {self.STRATEGIES}")
+        self.max_draft_tokens = max_draft_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.strategy = strategy
+        self.counter = counter
+
+    @classmethod
+    def from_env(cls):
+        """Build a budget from BLOG_MAX_DRAFT_TOKENS, BLOG_MAX_PROMPT_TOKENS and BLOG_BUDGET_STRATEGY."""
+        return cls(
+            max_draft_tokens=int(os.getenv("BLOG_MAX_DRAFT_TOKENS", "2500")),
+            max_prompt_tokens=int(os.getenv("BLOG_MAX_PROMPT_TOKENS", "4000")),
+            strategy=os.getenv("BLOG_BUDGET_STRATEGY", "auto"),
+        )
+
+    def measure(self, prompt_text):
+        """Count a prompt's tokens, record them for the current node and flag overruns."""
+        tokens = self.counter(prompt_text)
+        node = record_prompt_size(tokens)
+        if tokens > self.max_prompt_tokens:
+            logger.warning("prompt for %s is %d tokens, over the %d token budget", node, tokens, self.max_prompt_tokens)
+        return tokens
+
+    def fit(self, draft, structuring="single"):
+        """Return ``(draft, structuring)`` for a draft about to be structured."""
+        tokens = self.counter(draft)
+        if self.strategy == "off" or tokens <= self.max_draft_tokens:
+            decision = "fits"
+        elif structuring == "sections":
+            # Already chunked: every prompt carries one section.
+            decision = "chunked"
+        elif self.strategy == "chunk" or (self.strategy == "auto" and tokens > 2 * self.max_draft_tokens):
+            decision, structuring = "chunked", "sections"
+        else:
+            decision, draft = "compacted", compact_draft(draft, self.max_draft_tokens, self.counter)
+        BUDGET_DECISIONS.labels(decision=decision).inc()
+        if decision == "fits":
+            logger.debug("draft of %d tokens fits the %d token budget", tokens, self.max_draft_tokens)
+            return draft, structuring
+        if decision == "compacted":
+            largest = self.counter(draft)
+        else:
+            largest = max(self.counter(body) for _, body in split_markdown_sections(draft)[1])
+        logger.info(
+            "draft of %d tokens is over the %d token budget: %s, largest structuring input now %d tokens",
+            tokens, self.max_draft_tokens, decision, largest,
+        )
+        return draft, structuring
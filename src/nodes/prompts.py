@@ -0,0 +1,208 @@
+import hashlib
+import string
+import textwrap
+import threading
+from langchain_core.messages import HumanMessage, SystemMessage
+from src.llms.throttling import estimate_tokens
+from src.monitoring.instrumentation import TEMPLATE_PROMPT_TOKENS, TEMPLATE_CALL_SECONDS
+
+class PromptMessages(list):
+    """A rendered prompt (a plain message list) that remembers the template it came from."""
+
+    def __init__(self, messages, template):
+        super().__init__(messages)
+        self.template = template
+
+class PromptTemplate:
+    """
+    A prompt split into a static ``system`` part and a variable ``user`` part.
+    The system text never contains a placeholder, so every call made from the
+    template starts with the same message, a prefix providers can cache; the
+    topic, draft and other request text only appears in the trailing user
+    message. Both parts are dedented and compiled once: rendering fills the
+    pre-split user text and reuses one SystemMessage. ``version`` is a hash
+    of the text, used in cache keys so editing a template never serves
+    responses written for the old wording.
+    """
+
+    def __init__(self, name, system, user):
+        self.name = name
+        self.system = textwrap.dedent(system).strip()
+        self.user = textwrap.dedent(user).strip()
+        if any(field for _, field, _, _ in string.Formatter().parse(self.system)):
+            raise ValueError(f"Prompt {name!r}: the system part must be static")
+        self.version = hashlib.sha256(f"{name}\0{self.system}\0{self.user}".encode("utf-8")).hexdigest()[:12]
+        self._parts = self._compile(self.user)
+        self._system_message = SystemMessage(content=self.system) if self.system else None
+        self.static_tokens = estimate_tokens(self.system) if self.system else 0
+        self._lock = threading.Lock()
+        self.metrics = {"calls": 0, "static_tokens": 0, "variable_tokens": 0, "seconds": 0.0}
+
+    @staticmethod
+    def _compile(text):
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f"Unsupported placeholder {{{field}!{conversion}:{spec}}}")
+            parts.append((literal, field))
+        return parts
+
+    def render_user(self, **values):
+        """The user text with ``values`` filled in; a missing value raises KeyError, like str.format."""
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in self._parts)
+
+    def messages(self, **values):
+        """The full prompt: the shared system message, then the rendered user message."""
+        user = HumanMessage(content=self.render_user(**values))
+        return PromptMessages([self._system_message, user] if self._system_message else [user], self)
+
+    def record(self, prompt_tokens, seconds):
+        """Account one call made with this template (``prompt_tokens`` is the whole prompt)."""
+        variable = max(0, prompt_tokens - self.static_tokens)
+        TEMPLATE_PROMPT_TOKENS.labels(template=self.name, part="static").inc(self.static_tokens)
+        TEMPLATE_PROMPT_TOKENS.labels(template=self.name, part="variable").inc(variable)
+        TEMPLATE_CALL_SECONDS.labels(template=self.name).observe(seconds)
+        with self._lock:
+            self.metrics["calls"] += 1
+            self.metrics["static_tokens"] += self.static_tokens
+            self.metrics["variable_tokens"] += variable
+            self.metrics["seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        calls = metrics["calls"]
+        total = metrics["static_tokens"] + metrics["variable_tokens"]
+        return {
+            "version": self.version,
+            "calls": calls,
+            "prefix_tokens": self.static_tokens,
+            "avg_prompt_tokens": round(total / calls, 1) if calls else None,
+            "cacheable_share": round(metrics["static_tokens"] / total, 3) if total else None,
+            "avg_call_seconds": round(metrics["seconds"] / calls, 3) if calls else None,
+        }
+
+class PromptRegistry:
+    """Every prompt BlogNode sends, by name."""
+
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, name, system="", user=""):
+        if name in self._templates:
+            raise ValueError(f"Prompt {name!r} is already registered")
+        template = self._templates[name] = PromptTemplate(name, system, user)
+        return template
+
+    def __getitem__(self, name):
+        return self._templates[name]
+
+    def stats(self):
+        return {name: template.stats() for name, template in self._templates.items()}
+
+PROMPTS = PromptRegistry()
+
+TITLE = PROMPTS.register(
+    "title",
+    system="""
+        You are an expert blog writer. Generate a creative and SEO-friendly blog title
+        for the topic the user gives. Reply with the title only.
+        """,
+    user="Topic: {topic}",
+)
+
+CONTENT = PROMPTS.register(
+    "content",
+    system="""
+        You are an expert blog writer. Generate a detailed blog content with a breakdown
+        for the topic the user gives, in Markdown with a heading for each part.
+        """,
+    user="Topic: {topic}",
+)
+
+STRUCTURE = PROMPTS.register(
+    "structure",
+    system="""
+        You are an expert content writer and translator.
+        Your task is to take the blog content the user gives, translate it into the
+        requested language, and then structure it into a complete blog format.
+
+        You MUST structure your output into a JSON object with a 'main_title', an 'introduction',
+        and a list of 'sections', where each section has its own 'title' and 'content'.
+        """,
+    user="""
+        LANGUAGE: {language}
+
+        ORIGINAL CONTENT:
+        Title: {blog_title}
+        Content: {blog_content}
+        """,
+)
+
+SECTION = PROMPTS.register(
+    "section",
+    system="""
+        You are an expert content writer and translator.
+        Translate the part of a blog post the user gives into the requested language and
+        turn it into one polished blog section with a 'title' and Markdown 'content'.
+        """,
+    user="""
+        LANGUAGE: {language}
+        BLOG TITLE: {blog_title}
+        SECTION HEADING: {heading}
+        SECTION CONTENT:
+        {content}
+        """,
+)
+
+OVERVIEW = PROMPTS.register(
+    "overview",
+    system="""
+        You are an expert content writer and translator.
+        Write, in the requested language, a 'main_title' and a short 'introduction' for
+        a blog post with the working title and the sections the user lists.
+        """,
+    user="""
+        LANGUAGE: {language}
+        WORKING TITLE: {blog_title}
+        SECTIONS: {headings}
+        OPENING TEXT: {preamble}
+        """,
+)
+
+REGENERATE_SECTION = PROMPTS.register(
+    "regenerate_section",
+    system="""
+        You are an expert content writer and editor.
+        Rewrite one section of an existing blog post, in the requested language. Keep its
+        topic and its place in the flow between the sections around it, but write it
+        afresh: return a 'title' and Markdown 'content' for this section only.
+        """,
+    user="""
+        LANGUAGE: {language}
+        {instructions}
+        BLOG TITLE: {blog_title}
+        INTRODUCTION: {introduction}
+
+        PREVIOUS SECTION: {previous}
+
+        SECTION TO REWRITE:
+        {heading}
+        {content}
+
+        NEXT SECTION: {next}
+        """,
+)
+
+# Appended to the original prompt, so it has no system part of its own.
+REMAINDER = PROMPTS.register(
+    "remainder",
+    user="""
+        Your previous answer to the request above was cut short or malformed.
+        These parts of it were kept:
+        {kept}
+
+        Return ONLY the missing fields: {missing}. Continue a list after the items
+        already kept, without repeating them.
+        """,
+)
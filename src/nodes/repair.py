@@ -0,0 +1,278 @@
+import json
+import logging
+import re
+import typing
+from functools import lru_cache
+from pydantic import BaseModel, create_model
+from src.monitoring.instrumentation import STRUCTURED_REPAIRS
+
+logger = logging.getLogger(__name__)
+
+# Keys models commonly use instead of the schema's own field names.
+FIELD_SYNONYMS = {
+    "title": ("heading", "name", "section_title"),
+    "content": ("body", "text", "markdown", "section_content"),
+    "main_title": ("title", "blog_title", "headline"),
+    "introduction": ("intro", "summary", "overview"),
+    "sections": ("parts", "chapters", "body"),
+}
+
+# Only the most recent cut points are tried before giving up.
+MAX_CUT_ATTEMPTS = 64
+
+class PartialOutput(ValueError):
+    """
+    Structured output that parsed only in part. ``values`` holds the fields
+    (and list items) that were salvaged, ``missing`` the fields still needed.
+    """
+
+    def __init__(self, schema, values, missing):
+        super().__init__(f"{schema.__name__} output is missing {', '.join(missing)}")
+        self.schema = schema
+        self.values = values
+        self.missing = missing
+
+class IncrementalJSONParser:
+    """
+    Tolerant JSON parser that can be fed a model's output chunk by chunk.
+    The scan state (open containers, string and escape flags, and the points
+    where the text can be cut back to a valid prefix) is kept between feeds,
+    so each chunk is scanned once. ``snapshot()`` closes whatever is still
+    open and returns the best parse of everything seen so far: prose or code
+    fences around the object are skipped, truncated strings and containers
+    are closed, and a dangling key or value is dropped.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.length = 0
+        self.started = False
+        self.done = False
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        # (end offset, closers) pairs: text[:end] + closers is valid JSON.
+        self.cuts = []
+
+    def feed(self, chunk):
+        if self.done:
+            return self
+        start = 0
+        if not self.started:
+            match = re.search(r"[{\[]", chunk)
+            if match is None:
+                return self
+            self.started = True
+            start = match.start()
+        for offset, char in enumerate(chunk[start:]):
+            position = self.length + offset + 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append("}" if char == "{" else "]")
+                self.cuts.append((position, "".join(reversed(self.stack))))
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    self.text.append(chunk[start:start + offset + 1])
+                    self.length = position
+                    self.done = True
+                    return self
+                self.cuts.append((position, "".join(reversed(self.stack))))
+            elif char == ",":
+                self.cuts.append((position - 1, "".join(reversed(self.stack))))
+        self.text.append(chunk[start:])
+        self.length += len(chunk) - start
+        return self
+
+    def snapshot(self):
+        """``(data, complete)``: the repaired value (None if nothing parses) and whether the JSON was whole."""
+        if not self.started:
+            return None, False
+        text = "".join(self.text)
+        if self.done:
+            try:
+                return json.loads(text, strict=False), True
+            except json.JSONDecodeError:
+                pass
+        closed = text + ('"' if self.in_string else "")
+        candidates = [closed.rstrip().rstrip(",:").rstrip() + "".join(reversed(self.stack))]
+        candidates += [text[:end] + closers for end, closers in reversed(self.cuts[-MAX_CUT_ATTEMPTS:])]
+        for candidate in candidates:
+            try:
+                return json.loads(candidate, strict=False), False
+            except json.JSONDecodeError:
+                continue
+        return None, False
+
+def parse_partial(text):
+    """Parse possibly truncated or wrapped JSON text; see :class:`IncrementalJSONParser`."""
+    return IncrementalJSONParser().feed(text).snapshot()
+
+def raw_output_text(raw):
+    """The JSON text behind a structured call's raw message: tool call arguments or plain content."""
+    if raw is None or isinstance(raw, str):
+        return raw
+    for call in getattr(raw, "tool_calls", None) or []:
+        return json.dumps(call.get("args") or {})
+    for call in getattr(raw, "invalid_tool_calls", None) or []:
+        if call.get("args"):
+            return call["args"]
+    function_call = (getattr(raw, "additional_kwargs", None) or {}).get("function_call")
+    if function_call and function_call.get("arguments"):
+        return function_call["arguments"]
+    content = getattr(raw, "content", None)
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or None
+
+def _normalize_key(key):
+    return re.sub(r"[\s\-]+", "_", str(key).strip()).lower()
+
+def _pick(data, name):
+    """The value for field ``name``, accepting case, spacing and common synonyms."""
+    keys = {_normalize_key(key): key for key in data}
+    for candidate in (name, *FIELD_SYNONYMS.get(name, ())):
+        if candidate in keys:
+            return data[keys[candidate]]
+    return None
+
+def _item_model(annotation):
+    """The pydantic model of a ``List[Model]`` field, else None."""
+    if typing.get_origin(annotation) in (list, typing.List):
+        (item,) = typing.get_args(annotation)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return item
+    return None
+
+def _coerce_text(value):
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and value and all(isinstance(part, str) for part in value):
+        return "\n\n".join(part.strip() for part in value)
+    return None
+
+def _coerce_items(model, value):
+    """Valid items of a list field; a ``{title: content}`` mapping is read as a list too."""
+    if isinstance(value, dict):
+        value = [{"title": title, "content": content} for title, content in value.items()]
+    if not isinstance(value, list):
+        return []
+    items = []
+    for item in value:
+        if not isinstance(item, dict):
+            continue
+        values, missing = salvage(model, item, complete=True)
+        if not missing:
+            items.append(model.model_validate(values))
+    return items
+
+def salvage(schema, data, complete):
+    """
+    Recover what is usable from parsed (possibly partial) output for ``schema``:
+    ``(values, missing)``. Keys are matched loosely and scalars coerced to text.
+    A section without a title takes its Markdown heading. When the output was
+    truncated, its last field and the last item of a trailing list may be cut
+    short, so they are treated as missing rather than trusted.
+    """
+    if not isinstance(data, dict):
+        data = {"sections": data} if isinstance(data, list) else {}
+    last_key = _normalize_key(next(reversed(data))) if data else None
+    values, missing = {}, []
+    for name, field in schema.model_fields.items():
+        raw = _pick(data, name)
+        truncated = not complete and raw is not None and last_key in (name, *FIELD_SYNONYMS.get(name, ()))
+        model = _item_model(field.annotation)
+        if model is not None:
+            items = _coerce_items(model, raw)
+            if truncated and isinstance(raw, list) and items and len(items) == len(raw):
+                items = items[:-1]
+            values[name] = items
+            if not items or truncated:
+                missing.append(name)
+            continue
+        value = None if truncated else _coerce_text(raw)
+        if value is None and name == "title" and (content := _coerce_text(_pick(data, "content"))):
+            heading = re.match(r"#+\s*(.+)", content)
+            value = heading.group(1).strip() if heading else None
+        if value is None:
+            missing.append(name)
+        else:
+            values[name] = value
+    return values, missing
+
+def _call_arguments(data, complete):
+    """
+    Unwrap a tool call the model wrote out as text instead of making it
+    (``{"name": ..., "arguments": {...}}``, as in Groq's failed_generation).
+    """
+    call = data[0] if isinstance(data, list) and len(data) == 1 else data
+    if isinstance(call, dict) and "name" in call:
+        arguments = call.get("arguments", call.get("parameters"))
+        if isinstance(arguments, str):
+            arguments, complete = parse_partial(arguments)
+        if isinstance(arguments, dict):
+            return arguments, complete
+    return data, complete
+
+def repair_structured(schema, raw, error=None):
+    """
+    Rebuild ``schema`` from a structured call's raw message (or the output
+    text itself, such as a rejected tool call's failed_generation) when the
+    provider-side parse failed. Returns the instance if the output could be
+    repaired locally; raises :class:`PartialOutput` with what was salvaged
+    if some fields are still missing, or the original error if nothing
+    usable came back.
+    """
+    text = raw_output_text(raw)
+    data, complete = parse_partial(text) if text else (None, False)
+    if data is None:
+        raise error or ValueError(f"Model returned no {schema.__name__}")
+    values, missing = salvage(schema, *_call_arguments(data, complete))
+    if missing:
+        raise PartialOutput(schema, values, missing)
+    STRUCTURED_REPAIRS.labels(schema=schema.__name__, outcome="repaired").inc()
+    logger.info("repaired malformed %s output locally", schema.__name__)
+    return schema.model_validate(values)
+
+@lru_cache(maxsize=64)
+def remainder_schema(schema, missing):
+    """A model asking only for the ``missing`` fields (a tuple) of ``schema``."""
+    fields = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in missing}
+    return create_model(f"{schema.__name__}Remainder", __doc__=schema.__doc__, **fields)
+
+def merge_remainder(partial, remainder):
+    """Complete the salvaged values with a remainder answer: lists are continued, other fields filled."""
+    values = dict(partial.values)
+    for name in partial.missing:
+        value = getattr(remainder, name)
+        if isinstance(value, list):
+            # Items the model repeated from the kept part are not added twice.
+            kept = {_normalize_key(getattr(item, "title", "")) for item in values.get(name, [])}
+            value = values.get(name, []) + [
+                item for item in value if _normalize_key(getattr(item, "title", "")) not in kept
+            ]
+        values[name] = value
+    return partial.schema.model_validate(values)
+
+def describe_kept(partial):
+    """Short description of the salvaged part, for the follow-up prompt."""
+    lines = []
+    for name, value in partial.values.items():
+        if isinstance(value, list):
+            titles = "; ".join(getattr(item, "title", "") for item in value)
+            lines.append(f"{name}: {len(value)} complete so far ({titles})")
+        else:
+            lines.append(f"{name}: {value[:200]}")
+    return "\n".join(lines) or "(nothing)"
@@ -0,0 +1,76 @@
+import re
+
+HEADING = re.compile(r"^\s{0,3}(#{1,4}\s+.+|\*\*[^*]+\*\*:?)\s*$")
+
+def _heading_text(line):
+    return line.strip().lstrip("#").strip().strip("*").rstrip(":").strip()
+
+def _split_long(paragraph, max_chars):
+    """Cut one oversized paragraph on sentence, then word, boundaries."""
+    units = [word for sentence in re.split(r"(?<=[.!?])\s+", paragraph)
+             for word in (sentence.split() if len(sentence) > max_chars else [sentence])]
+    pieces, current = [], ""
+    for unit in units:
+        if current and len(current) + len(unit) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _split_paragraphs(text, max_chars):
+    """Greedily pack paragraphs into chunks of at most ``max_chars``."""
+    chunks, current = [], ""
+    paragraphs = re.split(r"\n\s*\n", text)
+    paragraphs = [piece for paragraph in paragraphs
+                  for piece in (_split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph])]
+    for paragraph in paragraphs:
+        if current and len(current) + len(paragraph) > max_chars:
+            chunks.append(current.strip())
+            current = ""
+        current += paragraph + "\n\n"
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+def split_markdown_sections(markdown, max_chars=4000, min_chars=200):
+    """
+    Split a markdown draft into ``(preamble, [(heading, body), ...])``.
+
+    Headings (``#`` lines or standalone bold lines) start a new chunk; tiny
+    chunks are folded into the previous one and oversized ones are split on
+    paragraph boundaries, so each chunk is a reasonably sized unit of work.
+    A draft without headings is split on paragraphs alone.
+    """
+    preamble, chunks = [], []
+    heading, body = None, []
+    for line in markdown.splitlines():
+        if HEADING.match(line):
+            if heading is not None:
+                chunks.append((heading, "\n".join(body).strip()))
+            heading, body = _heading_text(line), []
+        elif heading is None:
+            preamble.append(line)
+        else:
+            body.append(line)
+    if heading is not None:
+        chunks.append((heading, "\n".join(body).strip()))
+
+    preamble = "\n".join(preamble).strip()
+    if not chunks:
+        return "", [("", part) for part in _split_paragraphs(preamble, max_chars)]
+
+    merged = []
+    for heading, body in chunks:
+        if merged and len(body) < min_chars:
+            previous_heading, previous_body = merged[-1]
+            merged[-1] = (previous_heading, f"{previous_body}\n\n**{heading}**\n{body}".strip())
+        else:
+            merged.append((heading, body))
+
+    sized = []
+    for heading, body in merged:
+        parts = _split_paragraphs(body, max_chars) if len(body) > max_chars else [body]
+        sized.extend((heading, part) for part in parts)
+    return preamble, sized
@@ -0,0 +1,144 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from contextlib import AsyncExitStack, asynccontextmanager
+from src.monitoring.instrumentation import ADMISSIONS
+
+class Rejected(Exception):
+    """A request turned away at admission; ``status`` is 429 or 503, ``retry_after`` in seconds."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class AdmissionController:
+    """
+    Admission control for generations on this worker, so an overload is
+    answered with a fast 429/503 instead of every request timing out
+    together. At most ``max_active`` generations run; up to ``max_queue``
+    more wait for a slot, and beyond that requests are rejected with 503.
+    A queued request is also rejected up front when the expected wait plus a
+    typical generation would overrun its deadline, or dropped if the deadline
+    passes while it waits. Each client may have ``per_client`` requests in
+    flight (429 beyond that). ``Retry-After`` comes from the recent
+    generation time (an EWMA) and the queue length.
+    """
+
+    def __init__(self, max_active=64, max_queue=128, per_client=8, alpha=0.2):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.per_client = per_client
+        self.alpha = alpha
+        self.slots = asyncio.Semaphore(max_active)
+        self.service_time = None
+        self._waiting = 0
+        self._active = 0
+        self._clients = Counter()
+        self.metrics = {"admitted": 0, "client_quota": 0, "queue_full": 0, "deadline": 0, "expired": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Build from MAX_CONCURRENT_GENERATIONS, MAX_QUEUED_GENERATIONS and CLIENT_MAX_IN_FLIGHT."""
+        return cls(
+            max_active=int(os.getenv("MAX_CONCURRENT_GENERATIONS", "64")),
+            max_queue=int(os.getenv("MAX_QUEUED_GENERATIONS", "128")),
+            per_client=int(os.getenv("CLIENT_MAX_IN_FLIGHT", "8")),
+        )
+
+    def expected_wait(self):
+        """Rough seconds a request arriving now waits for a slot."""
+        if self.service_time is None or not self.slots.locked():
+            return 0.0
+        return self.service_time * (self._waiting + 1) / self.max_active
+
+    def _reject(self, outcome, status, reason, retry_after):
+        self.metrics[outcome] += 1
+        ADMISSIONS.labels(outcome=outcome).inc()
+        raise Rejected(status, reason, retry_after)
+
+    def _check_client(self, client_id):
+        if self._clients[client_id] >= self.per_client:
+            self._reject(
+                "client_quota", 429, f"Client has {self.per_client} requests in flight",
+                self.service_time or 1.0,
+            )
+
+    def _check_queue(self, arrived, deadline):
+        if self.slots.locked():
+            wait = self.expected_wait()
+            if self._waiting >= self.max_queue:
+                self._reject("queue_full", 503, "Server is at capacity", wait)
+            if deadline is not None and self.service_time is not None and arrived + wait + self.service_time > deadline:
+                self._reject("deadline", 503, "Request could not finish before its deadline", wait)
+
+    def check(self, client_id, deadline=None):
+        """
+        Raise Rejected if ``client_id`` would be turned away right now, without
+        holding anything. For responses that only acquire once their body is
+        read, so nothing leaks when it never is.
+        """
+        self._check_client(client_id)
+        self._check_queue(time.monotonic(), deadline)
+
+    @asynccontextmanager
+    async def client(self, client_id):
+        """Hold one of ``client_id``'s in-flight requests; 429 when it has none left."""
+        self._check_client(client_id)
+        self._clients[client_id] += 1
+        try:
+            yield
+        finally:
+            self._clients[client_id] -= 1
+            if not self._clients[client_id]:
+                del self._clients[client_id]
+
+    @asynccontextmanager
+    async def slot(self, deadline=None):
+        """Hold a generation slot, queueing within bounds; yields the seconds spent queued."""
+        arrived = time.monotonic()
+        self._check_queue(arrived, deadline)
+        self._waiting += 1
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - arrived)
+            await asyncio.wait_for(self.slots.acquire(), timeout)
+        except TimeoutError:
+            self._reject("expired", 503, "Deadline passed while queued", self.expected_wait())
+        finally:
+            self._waiting -= 1
+        self.metrics["admitted"] += 1
+        ADMISSIONS.labels(outcome="admitted").inc()
+        self._active += 1
+        started = time.monotonic()
+        try:
+            yield started - arrived
+        finally:
+            self._active -= 1
+            self.slots.release()
+            elapsed = time.monotonic() - started
+            self.service_time = elapsed if self.service_time is None else (
+                self.alpha * elapsed + (1 - self.alpha) * self.service_time
+            )
+
+    async def admit(self, client_id, deadline=None):
+        """Client quota and slot together, as an exit stack the caller closes when the work is done."""
+        stack = AsyncExitStack()
+        try:
+            await stack.enter_async_context(self.client(client_id))
+            await stack.enter_async_context(self.slot(deadline))
+        except BaseException:
+            await stack.aclose()
+            raise
+        return stack
+
+    def stats(self):
+        return {
+            **self.metrics,
+            "active": self._active,
+            "queued": self._waiting,
+            "clients": len(self._clients),
+            "service_time": round(self.service_time, 3) if self.service_time is not None else None,
+        }
@@ -0,0 +1,64 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+import uvicorn
+from src.jobs.worker import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Files every worker opens so caches and provider limits are shared, not per process.
+SHARED_STATE = {
+    "BLOG_CACHE_DB": "response_cache.sqlite",
+    "LLM_RATE_LIMIT_DB": "ratelimit.sqlite",
+}
+
+def default_workers():
+    """WEB_CONCURRENCY if set (the usual convention), else one worker per core."""
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+
+def worker_environment(workers, llm_connections=None):
+    """
+    Environment for the server workers. The LLM connection budget is split
+    across workers, so N workers together keep ``llm_connections`` open
+    rather than N times that.
+    """
+    env = {name: os.getenv(name, default) for name, default in SHARED_STATE.items()}
+    total = llm_connections or int(os.getenv("LLM_TOTAL_CONNECTIONS", "0"))
+    if total:
+        per_worker = max(1, math.ceil(total / workers))
+        keepalive = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        env["LLM_MAX_CONNECTIONS"] = str(per_worker)
+        env["LLM_MAX_KEEPALIVE_CONNECTIONS"] = str(min(keepalive, per_worker))
+    # Job workers are started once here, not once per server worker.
+    env["JOB_WORKERS"] = "0"
+    return env
+
+def serve(host="0.0.0.0", port=8000, workers=None, llm_connections=None, log_level="info"):
+    """
+    Production entry point: ``workers`` uvicorn worker processes behind one
+    socket, no reloader. Each worker builds its own LLM client, connection
+    pool and graphs; the response cache, rate limits and Prometheus metrics
+    are shared through files every worker opens. The job workers behind
+    POST /jobs run as one pool beside them.
+    """
+    workers = workers or default_workers()
+    job_workers = WorkerPool()
+    os.environ.update(worker_environment(workers, llm_connections))
+    # Counters from every worker, merged on each /metrics scrape. Workers are
+    # fresh processes, so the variable is set before they import prometheus_client.
+    metrics_dir = None
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="blog-metrics-")
+    logger.info(
+        "serving on %s:%d with %d workers, %s LLM connections each, %d job workers",
+        host, port, workers, os.getenv("LLM_MAX_CONNECTIONS", "100"), job_workers.processes,
+    )
+    job_workers.start()
+    try:
+        uvicorn.run("app:app", host=host, port=port, workers=workers, log_level=log_level, reload=False)
+    finally:
+        job_workers.stop()
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
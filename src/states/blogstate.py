@@ -1,4 +1,4 @@
-from typing import TypedDict, List
+from typing import TypedDict, List, Annotated
 from pydantic import BaseModel, Field
 
 # NEW: A model to represent a single section of the blog.
@@ -14,11 +14,38 @@ class Blog(BaseModel):
     introduction: str = Field(description="An introductory summary of the blog post.")
     sections: List[BlogSection] = Field(description="A list of the individual sections that make up the blog.")
 
-# The main state remains the same, but it will now hold our new Blog structure.
+# Header of a blog, produced separately when sections are structured in parallel.
+class BlogOverview(BaseModel):
+    """The title and introduction of a blog post whose sections are built separately."""
+    main_title: str = Field(description="The overarching title of the entire blog post.")
+    introduction: str = Field(description="An introductory summary of the blog post.")
+
+def merge_blog(left: dict, right: dict) -> dict:
+    """
+    Reducer for the 'blog' channel. Partial drafts written by nodes running in
+    the same step (e.g. the title and the content) are merged key by key, while
+    a fully structured blog (one with 'sections') replaces the draft.
+    """
+    if right is None:
+        return left
+    if left is None or "sections" in right:
+        return right
+    return {**left, **right}
+
+def merge_language_blogs(left: dict, right: dict) -> dict:
+    """Reducer for the 'blogs' channel: collects one structured blog per language."""
+    return {**(left or {}), **(right or {})}
+
+# The main state holds our Blog structure; drafts are merged via merge_blog.
+# 'languages' requests a fan-out, whose results land in 'blogs' keyed by language.
+# 'structuring' set to "sections" structures the draft section by section.
 class BlogState(TypedDict):
     topic: str
-    blog: Blog
+    blog: Annotated[Blog, merge_blog]
     current_language: str
+    languages: List[str]
+    structuring: str
+    blogs: Annotated[dict[str, Blog], merge_language_blogs]
 
 # from typing import TypedDict
 # from pydantic import BaseModel,Field
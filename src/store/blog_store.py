@@ -0,0 +1,256 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from src.states.blogstate import Blog, BlogSection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blogs (
+    id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL COLLATE NOCASE,
+    language TEXT NOT NULL,
+    model TEXT NOT NULL,
+    main_title TEXT NOT NULL,
+    introduction TEXT NOT NULL,
+    request_id TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blogs_topic ON blogs(topic, created_at DESC);
+CREATE INDEX IF NOT EXISTS blogs_language ON blogs(language, created_at DESC);
+CREATE INDEX IF NOT EXISTS blogs_model ON blogs(model, created_at DESC);
+CREATE INDEX IF NOT EXISTS blogs_created ON blogs(created_at DESC, id DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS blogs_request ON blogs(request_id, language);
+CREATE TABLE IF NOT EXISTS sections (
+    blog_id TEXT NOT NULL REFERENCES blogs(id),
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    body BLOB NOT NULL,
+    UNIQUE (blog_id, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS sections_fts USING fts5(title, body, content='', tokenize='porter unicode61');
+"""
+
+SUMMARY_COLUMNS = "id, topic, language, model, main_title, created_at"
+
+def _compress(text):
+    return zlib.compress(text.encode("utf-8"), 6)
+
+def _decompress(blob):
+    return zlib.decompress(blob).decode("utf-8")
+
+def fts_query(text):
+    """
+    Match any of the words, ranked by bm25. Every word is quoted so user
+    input can never be parsed as FTS5 syntax.
+    """
+    return " OR ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+class BlogStore:
+    """
+    Persistent store for generated blogs in SQLite. Header fields stay plain
+    (and indexed by topic, language, model and creation time); section bodies,
+    the bulk of each row, are zlib-compressed. A contentless FTS5 index over
+    section titles and text lets editors find an existing post before paying
+    for a new one. Listing and search are generators that read in small
+    batches, so a page never loads more than it returns.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("BLOG_STORE_DB", "blogs.sqlite")
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """The store at BLOG_STORE_DB, or None when BLOG_STORE=off."""
+        if os.getenv("BLOG_STORE", "on") == "off":
+            return None
+        return cls()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def save(self, blog, topic, language, model, request_id=None):
+        """Store one structured blog; returns its id (the existing one for a repeated request_id)."""
+        blog = Blog.model_validate(blog)
+        blog_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO blogs (id, topic, language, model, main_title, introduction, request_id, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (blog_id, topic, language, model, blog.main_title, blog.introduction, request_id, time.time()),
+                ).rowcount
+                if not inserted:
+                    self._conn.execute("COMMIT")
+                    row = self._conn.execute(
+                        "SELECT id FROM blogs WHERE request_id = ? AND language = ?", (request_id, language)
+                    ).fetchone()
+                    return row["id"]
+                for position, section in enumerate(blog.sections):
+                    rowid = self._conn.execute(
+                        "INSERT INTO sections (blog_id, position, title, body) VALUES (?, ?, ?, ?)",
+                        (blog_id, position, section.title, _compress(section.content)),
+                    ).lastrowid
+                    self._conn.execute(
+                        "INSERT INTO sections_fts (rowid, title, body) VALUES (?, ?, ?)",
+                        (rowid, section.title, section.content),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return blog_id
+
+    def save_state(self, state, model, request_id=None):
+        """Store every structured blog in a final graph state; returns ``{language: id}``."""
+        if state.get("blogs"):
+            blogs = state["blogs"]
+        elif state.get("blog") and "sections" in state["blog"]:
+            blogs = {state.get("current_language") or "english": state["blog"]}
+        else:
+            return {}
+        return {
+            language: self.save(blog, state.get("topic", ""), language, model, request_id)
+            for language, blog in blogs.items()
+        }
+
+    def load_state(self, request_id, languages=None):
+        """
+        A final graph state rebuilt from the blogs stored for ``request_id``
+        (``blogs`` by language for a ``languages`` run, else one ``blog``),
+        or None if nothing was stored for it.
+        """
+        with self._lock:
+            ids = [row["id"] for row in self._conn.execute(
+                "SELECT id FROM blogs WHERE request_id = ? ORDER BY id", (request_id,)
+            )]
+        records = [record for record in map(self.get, ids) if record is not None]
+        if not records:
+            return None
+        state = {"topic": records[0]["topic"]}
+        if languages is not None:
+            state["blogs"] = {record["language"]: record["blog"].model_dump() for record in records}
+        else:
+            state["current_language"] = records[0]["language"]
+            state["blog"] = records[0]["blog"].model_dump()
+        return state
+
+    def replace_section(self, blog_id, position, section):
+        """Swap one stored section for a regenerated one, keeping the search index in step."""
+        section = BlogSection.model_validate(section)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT rowid, title, body FROM sections WHERE blog_id = ? AND position = ?", (blog_id, position)
+                ).fetchone()
+                if row is None:
+                    raise KeyError(f"Blog {blog_id} has no section {position}")
+                # Contentless FTS5 rows are removed by replaying the indexed values.
+                self._conn.execute(
+                    "INSERT INTO sections_fts (sections_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                    (row["rowid"], row["title"], _decompress(row["body"])),
+                )
+                self._conn.execute(
+                    "UPDATE sections SET title = ?, body = ? WHERE rowid = ?",
+                    (section.title, _compress(section.content), row["rowid"]),
+                )
+                self._conn.execute(
+                    "INSERT INTO sections_fts (rowid, title, body) VALUES (?, ?, ?)",
+                    (row["rowid"], section.title, section.content),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, blog_id):
+        """The stored record with its Blog, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM blogs WHERE id = ?", (blog_id,)).fetchone()
+            if row is None:
+                return None
+            sections = self._conn.execute(
+                "SELECT title, body FROM sections WHERE blog_id = ? ORDER BY position", (blog_id,)
+            ).fetchall()
+        blog = Blog(
+            main_title=row["main_title"],
+            introduction=row["introduction"],
+            sections=[BlogSection(title=s["title"], content=_decompress(s["body"])) for s in sections],
+        )
+        return {
+            "id": row["id"], "topic": row["topic"], "language": row["language"], "model": row["model"],
+            "created_at": row["created_at"], "blog": blog,
+        }
+
+    def _iter_rows(self, sql, params, batch=100):
+        # A private connection per iteration: safe to consume from a worker
+        # thread while the shared connection keeps serving writes.
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while rows := cursor.fetchmany(batch):
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def iter_blogs(self, topic=None, language=None, model=None, before=None, limit=50):
+        """
+        Blog summaries, newest first, filtered by exact topic (case-insensitive),
+        language and model. ``before`` is the ``cursor`` of the last summary of
+        the previous page; a malformed one raises ValueError before any row is read.
+        """
+        clauses, params = [], []
+        for column, value in (("topic", topic), ("language", language), ("model", model)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if before:
+            created_at, _, blog_id = before.partition(":")
+            clauses.append("(created_at, id) < (?, ?)")
+            params += [float(created_at), blog_id]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {SUMMARY_COLUMNS} FROM blogs {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        return self._with_cursors(self._iter_rows(sql, params + [limit]))
+
+    @staticmethod
+    def _with_cursors(rows):
+        for row in rows:
+            row["cursor"] = f"{row['created_at']!r}:{row['id']}"
+            yield row
+
+    def search(self, text, limit=20):
+        """Blog summaries whose sections best match ``text``, best first."""
+        query = fts_query(text)
+        if not query:
+            return
+        sql = (
+            f"SELECT {', '.join('b.' + c.strip() for c in SUMMARY_COLUMNS.split(','))}, MIN(f.rank) AS rank "
+            "FROM sections_fts f JOIN sections s ON s.rowid = f.rowid JOIN blogs b ON b.id = s.blog_id "
+            "WHERE sections_fts MATCH ? GROUP BY b.id ORDER BY rank LIMIT ?"
+        )
+        yield from self._iter_rows(sql, (query, limit))
+
+    def stats(self):
+        """
+        Row counts and compressed size. Scans the sections table, so it reads
+        on a private connection (saves are not held up) and callers on an
+        event loop should run it in a thread.
+        """
+        conn = self._connect()
+        try:
+            blogs = conn.execute("SELECT COUNT(*) FROM blogs").fetchone()[0]
+            sections = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM sections").fetchone()
+        finally:
+            conn.close()
+        return {"blogs": blogs, "sections": sections[0], "compressed_bytes": sections[1]}
@@ -1,8 +1,7 @@
 import streamlit as st
 import requests
-import base64
-from src.graphs.graph_builder import GraphBuilder
-from src.llms.groqllm import GroqLLM
+import json
+from src.graphs.visualization import workflow_png
 import os
 
 # --- Page Configuration ---
@@ -15,28 +14,26 @@ st.set_page_config(
 st.title("✍️ Agentic Blog Generator")
 st.markdown("This interface uses an agentic backend to generate high-quality blog posts. Below is the visual representation of the agent's workflow.")
 
-# --- Display Graph Image ---
-try:
-    # Instantiate the necessary components to build the graph for visualization
-    llm = GroqLLM().get_llm()
-    graph_builder = GraphBuilder(llm)
-    
-    # 1. Build the graph definition
-    uncompiled_graph = graph_builder.build_graph()
-    
-    # 2. Compile the graph to get a runnable and drawable instance
-    compiled_graph = uncompiled_graph.compile()
-    
-    # 3. Get the underlying graph structure and draw it as a PNG
-    image_bytes = compiled_graph.get_graph().draw_mermaid_png()
-    
-    # 4. Encode the image bytes to base64 to display in Streamlit
-    b64_image = base64.b64encode(image_bytes).decode()
-    
-    st.image(f"data:image/png;base64,{b64_image}", caption="Agent Workflow Graph")
+# --- Shared resources (created once per server process, not on every rerun) ---
+@st.cache_resource
+def workflow_image():
+    """The workflow PNG, or the error that prevented rendering it; cached so a failure is not retried per rerun."""
+    try:
+        return workflow_png(), None
+    except Exception as e:
+        return None, e
+
+@st.cache_resource
+def http_session():
+    """Keep-alive HTTP session to the backend, reused across reruns."""
+    return requests.Session()
 
-except Exception as e:
-    st.error(f"Could not generate graph visualization. Error: {e}")
+# --- Display Graph Image ---
+image_bytes, image_error = workflow_image()
+if image_bytes:
+    st.image(image_bytes, caption="Agent Workflow Graph")
+else:
+    st.error(f"Could not generate graph visualization. Error: {image_error}")
 
 
 st.markdown("---")
@@ -54,36 +51,63 @@ with st.form("blog_form"):
     submitted = st.form_submit_button("Generate Blog", type="primary")
 
 # --- Backend Communication and Rendering ---
+def iter_sse(response):
+    """Yield (event, data) pairs from a server-sent events response."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:") and event:
+            yield event, json.loads(line[len("data:"):].strip())
+            event = None
+
 if submitted:
     if not topic:
         st.error("Please enter a topic to generate the blog.")
     else:
         api_url = os.getenv("API_URL", "http://127.0.0.1:8000/blogs")
+        stream_url = os.getenv("STREAM_API_URL", f"{api_url}/stream")
         payload = {"topic": topic, "language": language}
 
         try:
-            with st.spinner("Generating your blog... This may take a moment."):
-                response = requests.post(api_url, json=payload)
+            status = st.info("Generating your blog... The draft appears below as it is written.")
+            title_placeholder = st.empty()
+            draft_placeholder = st.empty()
+            draft = ""
 
-                if response.status_code == 200:
-                    st.success("Blog generated successfully!")
-                    result = response.json()
-                    blog_data = result.get("data", {}).get("blog", {})
+            with http_session().post(stream_url, json=payload, stream=True) as response:
+                if response.status_code != 200:
+                    status.error(f"Failed to generate blog. Status code: {response.status_code}")
+                    st.json(response.json())
+                else:
+                    blog_data, error = {}, None
+                    for event, data in iter_sse(response):
+                        if event == "title":
+                            title_placeholder.subheader(data.get("title", ""))
+                        elif event == "token":
+                            draft += data.get("text", "")
+                            draft_placeholder.markdown(draft)
+                        elif event == "blog":
+                            blog_data = data.get("blog", {})
+                        elif event == "error":
+                            error = data
 
-                    if blog_data:
+                    # Replace the raw draft with the structured, translated blog.
+                    title_placeholder.empty()
+                    draft_placeholder.empty()
+                    if error:
+                        retry = f" Retry in {error['retry_after']}s." if error.get("retry_after") else ""
+                        status.error(f"Failed to generate blog: {error.get('detail', 'unknown error')}.{retry}")
+                    elif blog_data:
+                        status.success("Blog generated successfully!")
                         st.header(blog_data.get("main_title", "Blog Title"))
                         st.markdown(f"*{blog_data.get('introduction', '')}*")
-                        
+
                         for section in blog_data.get("sections", []):
                             st.subheader(section.get("title", "Section"))
                             st.markdown(section.get("content", ""))
                     else:
-                        st.error("Received an empty response from the backend.")
-                else:
-                    st.error(f"Failed to generate blog. Status code: {response.status_code}")
-                    st.json(response.json())
+                        status.error("Received an empty response from the backend.")
 
         except requests.exceptions.RequestException as e:
-            st.error(f"Could not connect to the backend at {api_url}. Please ensure your FastAPI server is running.")
-
-
+            st.error(f"Could not connect to the backend at {stream_url}. Please ensure your FastAPI server is running.")
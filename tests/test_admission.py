@@ -0,0 +1,102 @@
+import asyncio
+import time
+import pytest
+from src.serving.admission import AdmissionController, Rejected
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def hold(controller, release, deadline=None):
+    async with controller.slot(deadline):
+        await release.wait()
+
+async def until(predicate):
+    while not predicate():
+        await asyncio.sleep(0.001)
+
+def test_client_quota_is_429():
+    async def main():
+        controller = AdmissionController(max_active=4, per_client=1)
+        async with controller.client("a"):
+            with pytest.raises(Rejected) as info:
+                async with controller.client("a"):
+                    pass
+            async with controller.client("b"):
+                pass
+        return controller, info.value
+
+    controller, rejected = run(main())
+    assert rejected.status == 429 and rejected.retry_after >= 1
+    assert controller.metrics["client_quota"] == 1 and controller.stats()["clients"] == 0
+
+def test_full_queue_is_503():
+    async def main():
+        controller, release = AdmissionController(max_active=1, max_queue=1), asyncio.Event()
+        active = asyncio.create_task(hold(controller, release))
+        await until(lambda: controller.stats()["active"] == 1)
+        queued = asyncio.create_task(hold(controller, release))
+        await until(lambda: controller.stats()["queued"] == 1)
+        with pytest.raises(Rejected) as info:
+            async with controller.slot():
+                pass
+        release.set()
+        await asyncio.gather(active, queued)
+        return controller, info.value
+
+    controller, rejected = run(main())
+    assert rejected.status == 503 and controller.metrics["queue_full"] == 1
+    assert controller.metrics["admitted"] == 2
+    assert controller.stats()["active"] == controller.stats()["queued"] == 0
+
+def test_deadline_that_cannot_be_met_is_rejected_up_front():
+    async def main():
+        controller, release = AdmissionController(max_active=1, max_queue=4), asyncio.Event()
+        controller.service_time = 10.0
+        active = asyncio.create_task(hold(controller, release))
+        await until(lambda: controller.stats()["active"] == 1)
+        with pytest.raises(Rejected) as info:
+            controller.check("a", time.monotonic() + 1.0)
+        release.set()
+        await active
+        return controller, info.value
+
+    controller, rejected = run(main())
+    assert rejected.status == 503 and controller.metrics["deadline"] == 1
+    # Retry-After is the expected wait: one typical generation ahead of it.
+    assert rejected.retry_after == 10
+
+def test_request_expires_while_queued():
+    async def main():
+        controller, release = AdmissionController(max_active=1, max_queue=4), asyncio.Event()
+        active = asyncio.create_task(hold(controller, release))
+        await until(lambda: controller.stats()["active"] == 1)
+        with pytest.raises(Rejected) as info:
+            async with controller.slot(time.monotonic() + 0.05):
+                pass
+        queued_after = controller.stats()["queued"]
+        release.set()
+        await active
+        return controller, info.value, queued_after
+
+    controller, rejected, queued_after = run(main())
+    assert rejected.status == 503 and controller.metrics["expired"] == 1
+    assert queued_after == 0
+
+def test_slot_and_client_released_on_error():
+    async def main():
+        controller = AdmissionController(max_active=1, per_client=1)
+        with pytest.raises(RuntimeError):
+            async with await controller.admit("a"):
+                raise RuntimeError("generation failed")
+        # Both the slot and the client's quota are free again.
+        async with await controller.admit("a"):
+            pass
+        return controller
+
+    controller = run(main())
+    assert controller.stats()["active"] == 0 and controller.stats()["clients"] == 0
+    assert controller.service_time is not None
+
+def test_retry_after_is_at_least_one_second():
+    assert Rejected(503, "busy", 0.01).retry_after == 1
+    assert Rejected(503, "busy", 2.2).retry_after == 3
@@ -0,0 +1,24 @@
+import pytest
+from src.batch.runner import BatchRunner, InvalidRecord, parse_jsonl, record_id
+
+def test_repeated_topics_get_distinct_ids():
+    record = {"topic": "dup"}
+    assert len({record_id(record, position) for position in (1, 2, 3)}) == 3
+    assert record_id(record, 2) == record_id({"topic": "dup"}, 2)
+
+def test_explicit_id_is_kept():
+    assert record_id({"id": 7, "topic": "dup"}, 1) == "7"
+
+def test_derived_id_ignores_language_order_and_case():
+    a = record_id({"topic": "t", "languages": ["German", "french"]}, 1)
+    assert a == record_id({"topic": "t", "languages": ["french", "german"]}, 1)
+
+def test_parse_jsonl_reports_bad_lines():
+    records = list(parse_jsonl(['{"topic": "a"}', "", "not json", "[1]", b'{"topic": "b"}']))
+    assert records[0] == {"topic": "a"} and records[-1] == {"topic": "b"}
+    assert [r.line_number for r in records if isinstance(r, InvalidRecord)] == [3, 4]
+    assert records[1].result()["status"] == "error"
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError):
+        BatchRunner(registry=None, concurrency=0)
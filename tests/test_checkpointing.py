@@ -0,0 +1,57 @@
+import asyncio
+from typing import TypedDict
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from src.graphs.checkpointing import RequestConflict, ainvoke_resumable, sweep_checkpoints
+
+class State(TypedDict, total=False):
+    topic: str
+    current_language: str
+    blog: dict
+
+def build_graph():
+    graph = StateGraph(State)
+    graph.add_node("write", lambda state: {"blog": {"content": f"about {state['topic']}"}})
+    graph.add_edge(START, "write")
+    graph.add_edge("write", END)
+    return graph.compile(checkpointer=InMemorySaver())
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_retry_returns_completed_run():
+    graph = build_graph()
+    state, status = run(ainvoke_resumable(graph, {"topic": "tea"}, "r1"))
+    assert status == "fresh"
+    assert run(ainvoke_resumable(graph, {"topic": "tea"}, "r1")) == (state, "completed")
+
+def test_reused_id_with_other_inputs_conflicts():
+    graph = build_graph()
+    run(ainvoke_resumable(graph, {"topic": "tea"}, "r1"))
+    with pytest.raises(RequestConflict):
+        run(ainvoke_resumable(graph, {"topic": "coffee"}, "r1"))
+
+def test_lookup_answers_dropped_threads():
+    graph = build_graph()
+    stored = {"topic": "tea", "current_language": "english", "blog": {"content": "kept"}}
+
+    async def lookup(request_id):
+        return stored if request_id == "r1" else None
+
+    assert run(ainvoke_resumable(graph, {"topic": "tea"}, "r1", lookup=lookup)) == (stored, "completed")
+    with pytest.raises(RequestConflict):
+        run(ainvoke_resumable(graph, {"topic": "tea", "current_language": "german"}, "r1", lookup=lookup))
+    assert run(ainvoke_resumable(graph, {"topic": "tea"}, "r2", lookup=lookup))[1] == "fresh"
+
+def test_keep_false_drops_thread():
+    graph = build_graph()
+    run(ainvoke_resumable(graph, {"topic": "tea"}, "job-1", keep=False))
+    assert run(ainvoke_resumable(graph, {"topic": "tea"}, "job-1", keep=False))[1] == "fresh"
+
+def test_sweep_removes_only_stale_threads():
+    graph = build_graph()
+    run(ainvoke_resumable(graph, {"topic": "tea"}, "r1"))
+    assert run(sweep_checkpoints(graph.checkpointer, 3600)) == 0
+    assert run(sweep_checkpoints(graph.checkpointer, -1)) == 1
+    assert run(ainvoke_resumable(graph, {"topic": "tea"}, "r1"))[1] == "fresh"
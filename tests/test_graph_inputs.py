@@ -0,0 +1,36 @@
+import pytest
+from src.graphs.registry import graph_inputs
+
+def test_topic_only():
+    assert graph_inputs({"topic": "Agentic AI"}) == ("topic", {"topic": "Agentic AI", "structuring": "single"})
+
+def test_single_language():
+    usecase, inputs = graph_inputs({"topic": "Agentic AI", "language": "German"})
+    assert usecase == "language" and inputs["current_language"] == "german"
+
+def test_languages_are_lowercased_and_deduplicated():
+    _, inputs = graph_inputs({"topic": "Agentic AI", "languages": ["english", "English", "german"]})
+    assert inputs["languages"] == ["english", "german"]
+
+def test_lone_string_is_one_language():
+    _, inputs = graph_inputs({"topic": "Agentic AI", "languages": "german"})
+    assert inputs["languages"] == ["german"]
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"topic": "  "},
+    {"topic": 5},
+    {"topic": "Agentic AI", "languages": []},
+    {"topic": "Agentic AI", "languages": {"german": True}},
+    {"topic": "Agentic AI", "languages": ["german", 3]},
+    {"topic": "Agentic AI", "language": 5},
+    {"topic": "Agentic AI", "structuring": "bogus"},
+    {"topic": "Agentic AI", "structuring": ["sections"]},
+])
+def test_rejected(body):
+    with pytest.raises(ValueError):
+        graph_inputs(body)
+
+def test_sections_structuring():
+    _, inputs = graph_inputs({"topic": "Agentic AI", "structuring": "sections"})
+    assert inputs["structuring"] == "sections"
@@ -0,0 +1,101 @@
+import json
+import pytest
+from src.llms.throttling import failed_generation
+from src.nodes.repair import IncrementalJSONParser, PartialOutput, parse_partial, repair_structured, salvage
+from src.states.blogstate import Blog, BlogSection
+
+BLOG = {
+    "main_title": "Agents in Practice",
+    "introduction": "How agents plan and act.",
+    "sections": [
+        {"title": "Planning", "content": "Agents break goals into steps."},
+        {"title": "Tools", "content": "They call tools and observe results."},
+        {"title": "Memory", "content": "Memory keeps the context."},
+    ],
+}
+TEXT = json.dumps(BLOG)
+
+def test_complete_json():
+    assert parse_partial(TEXT) == (BLOG, True)
+
+def test_prose_and_fences_are_skipped():
+    data, complete = parse_partial(f"Here is the blog:\n```json\n{TEXT}\n```\nHope this helps!")
+    assert data == BLOG and complete
+
+def test_no_json():
+    assert parse_partial("Sorry, I cannot help with that.") == (None, False)
+
+def test_truncated_inside_string_closes_it():
+    cut = TEXT.index("Memory keeps") + len("Memory")
+    data, complete = parse_partial(TEXT[:cut])
+    assert not complete
+    assert data["sections"][-1] == {"title": "Memory", "content": "Memory"}
+
+def test_truncated_after_key_drops_it():
+    cut = TEXT.index('"introduction"') + len('"introduction":')
+    data, complete = parse_partial(TEXT[:cut])
+    assert not complete
+    assert data == {"main_title": "Agents in Practice"}
+
+def test_truncated_after_comma():
+    cut = TEXT.index('{"title": "Tools"')
+    data, complete = parse_partial(TEXT[:cut])
+    assert not complete
+    assert data["sections"] == BLOG["sections"][:1]
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_incremental_feed_matches_one_shot(size):
+    cut = TEXT[:TEXT.index("observe")]
+    parser = IncrementalJSONParser()
+    for start in range(0, len(cut), size):
+        parser.feed(cut[start:start + size])
+    assert parser.snapshot() == parse_partial(cut)
+
+def test_salvage_complete():
+    values, missing = salvage(Blog, BLOG, complete=True)
+    assert missing == []
+    assert [section.title for section in values["sections"]] == ["Planning", "Tools", "Memory"]
+
+def test_salvage_truncated_list_drops_last_item():
+    cut = TEXT.index("Memory keeps") + len("Memory")
+    values, missing = salvage(Blog, parse_partial(TEXT[:cut])[0], complete=False)
+    assert missing == ["sections"]
+    assert [section.title for section in values["sections"]] == ["Planning", "Tools"]
+    assert values["main_title"] == "Agents in Practice"
+
+def test_salvage_truncated_scalar_is_missing():
+    cut = TEXT.index("How agents plan") + len("How agents")
+    values, missing = salvage(Blog, parse_partial(TEXT[:cut])[0], complete=False)
+    assert values == {"main_title": "Agents in Practice", "sections": []}
+    assert missing == ["introduction", "sections"]
+
+def test_salvage_synonyms_and_heading():
+    data = {"Heading": "Planning", "body": ["Agents plan.", "Then act."]}
+    values, missing = salvage(BlogSection, data, complete=True)
+    assert values == {"title": "Planning", "content": "Agents plan.\n\nThen act."}
+    values, missing = salvage(BlogSection, {"content": "## Tools\nCall them."}, complete=True)
+    assert values["title"] == "Tools" and not missing
+
+def test_repair_raises_partial_output():
+    cut = TEXT.index("Memory keeps")
+    with pytest.raises(PartialOutput) as info:
+        repair_structured(Blog, TEXT[:cut])
+    assert info.value.missing == ["sections"]
+    assert len(info.value.values["sections"]) == 2
+
+def test_repair_failed_tool_call():
+    class BadRequestError(Exception):
+        status_code = 400
+
+    generation = json.dumps({"name": "Blog", "arguments": BLOG})
+    error = BadRequestError("Error code: 400 - " + repr({"error": {
+        "message": "Failed to call a function.", "type": "invalid_request_error",
+        "code": "tool_use_failed", "failed_generation": generation,
+    }}))
+    assert failed_generation(error) == generation
+    assert repair_structured(Blog, failed_generation(error), error) == Blog.model_validate(BLOG)
+
+def test_other_errors_have_no_failed_generation():
+    error = Exception("Error code: 400 - {'error': {'code': 'context_length_exceeded'}}")
+    assert failed_generation(error) is None
+    assert failed_generation(TimeoutError()) is None
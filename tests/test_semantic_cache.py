@@ -0,0 +1,39 @@
+import pytest
+from src.cache.semantic_cache import HashingEmbedder, SemanticCache
+
+THRESHOLD = SemanticCache().threshold
+
+def similarity(a, b):
+    embedder = HashingEmbedder()
+    return float(embedder.embed(a) @ embedder.embed(b))
+
+@pytest.mark.parametrize("a, b", [
+    ("Agentic AI", "What is agentic AI?"),
+    ("Agentic AI", "agentic ai explained"),
+    ("Large language models", "large language model"),
+    ("How do transformers work", "How transformers work"),
+])
+def test_rephrasings_match(a, b):
+    assert similarity(a, b) >= THRESHOLD
+
+@pytest.mark.parametrize("a, b", [
+    ("Why cats are better than dogs", "Why dogs are better than cats"),
+    ("Operating systems", "Operating"),
+    ("How to learn React", "How to learn React Native"),
+    ("Introduction to Python", "Python"),
+    ("Agentic AI", "Generative AI"),
+])
+def test_different_topics_do_not_match(a, b):
+    assert similarity(a, b) < THRESHOLD
+
+def test_lookup_is_namespaced_by_model():
+    cache = SemanticCache()
+    cache.add("model-a", "Agentic AI", "draft")
+    value, score, topic = cache.lookup("model-a", "What is agentic AI?")
+    assert value == "draft" and topic == "Agentic AI"
+    assert cache.lookup("model-b", "Agentic AI") is None
+    assert cache.lookup("model-a", "Why dogs are better than cats") is None
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("BLOG_SEMANTIC_CACHE", raising=False)
+    assert SemanticCache.from_env() is None
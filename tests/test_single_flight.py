@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import pytest
+from app import coalescing_key
+from src.cache.single_flight import SingleFlight
+from src.llms.throttling import DeadlineExceeded, SharedDeadline, current_deadline, deadline_scope
+
+def in_scope(deadline, coroutine_function):
+    """Run ``coroutine_function()`` as a caller whose request has ``deadline``."""
+    async def caller():
+        with deadline_scope(deadline):
+            return await coroutine_function()
+    return caller()
+
+def test_sync_followers_share_the_leaders_result():
+    flight, release, calls = SingleFlight("test"), threading.Event(), []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flight.metrics["followers"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 3 and len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+def test_sync_exception_reaches_every_caller():
+    flight, release = SingleFlight("test"), threading.Event()
+
+    def work():
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", work)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while flight.metrics["followers"] < 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+def test_sync_follower_gives_up_at_its_deadline():
+    flight, release = SingleFlight("test"), threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("k", lambda: release.wait(5)))
+    leader.start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.01)
+    with deadline_scope(time.monotonic() + 0.05), pytest.raises(DeadlineExceeded):
+        flight.do("k", lambda: None)
+    release.set()
+    leader.join()
+
+def test_async_callers_share_one_call():
+    flight, calls = SingleFlight("test"), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert len(calls) == 1
+    assert flight.stats()["saved"] == 2 and flight.stats()["in_flight"] == 0
+
+def test_async_exception_reaches_every_caller():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", work) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "result"
+
+def test_each_caller_waits_until_its_own_deadline():
+    flight, seen = SingleFlight("test"), []
+
+    async def work():
+        await asyncio.sleep(0.2)
+        seen.append(current_deadline())
+        return "result"
+
+    async def main():
+        now = time.monotonic()
+        short = asyncio.create_task(in_scope(now + 0.05, lambda: flight.ado("k", work)))
+        await asyncio.sleep(0.01)
+        long = asyncio.create_task(in_scope(now + 5, lambda: flight.ado("k", work)))
+        results = await asyncio.gather(short, long, return_exceptions=True)
+        return now, results
+
+    now, (short, long) = asyncio.run(main())
+    # The short request gives up; the work it started runs on for the longer one.
+    assert isinstance(short, DeadlineExceeded)
+    assert long == "result"
+    assert seen == [pytest.approx(now + 5)]
+
+def test_shared_deadline_join():
+    deadline = SharedDeadline(10.0)
+    deadline.join(20.0)
+    assert deadline.value == 20.0
+    nested = SharedDeadline(30.0)
+    deadline.join(nested)
+    assert deadline.value == 30.0
+    nested.join(None)
+    assert deadline.value is None
+
+def test_coalescing_key():
+    inputs = {"topic": "Agentic AI", "structuring": "single"}
+    assert coalescing_key("topic", inputs, "a") == coalescing_key("topic", dict(reversed(inputs.items())), "a")
+    assert coalescing_key("topic", inputs, "a") != coalescing_key("topic", inputs, "b")
+    assert coalescing_key("topic", inputs) != coalescing_key("language", inputs)
@@ -0,0 +1,185 @@
+import asyncio
+import email.utils
+import time
+from types import SimpleNamespace
+import pytest
+from src.llms import throttling
+from src.llms.throttling import (
+    CallScheduler, DeadlineExceeded, RateLimiter, SharedRateLimiter, TokenBucket, deadline_scope, no_hedging,
+    retry_after,
+)
+
+class FakeClock:
+    """Stands in for the time module: both clocks advance only when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttling, "time", clock)
+    return clock
+
+class ProviderError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+def test_token_bucket_refills_and_queues_debt():
+    bucket = TokenBucket(capacity=10, rate=1.0)
+    bucket.updated = 0.0
+    assert bucket.reserve(10, now=0.0) == 0.0
+    assert bucket.reserve(5, now=0.0) == pytest.approx(5.0)
+    # Five seconds later the debt is paid off.
+    assert bucket.reserve(0, now=5.0) == 0.0
+    bucket.refund(100)
+    assert bucket.level == 10
+
+def test_rate_limiter_reserve_settle_and_pause(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter.reserve(600) == 0.0
+    # The token bucket is empty: 100 more tokens take 10 s at 10 tokens/s.
+    assert limiter.reserve(100) == pytest.approx(10.0)
+    limiter.settle(estimated=700, actual=100)
+    assert limiter.reserve(0) == 0.0
+    limiter.pause(30)
+    assert limiter.reserve(0) == pytest.approx(30.0)
+    clock.advance(30)
+    assert limiter.reserve(0) == 0.0
+
+def test_shared_rate_limiter_is_shared_through_its_file(clock, tmp_path):
+    path = str(tmp_path / "limits.sqlite")
+    first = SharedRateLimiter(path, requests_per_minute=60, tokens_per_minute=600)
+    second = SharedRateLimiter(path, requests_per_minute=60, tokens_per_minute=600)
+    assert first.reserve(600) == 0.0
+    assert second.reserve(100) == pytest.approx(10.0)
+    second.settle(estimated=700, actual=100)
+    assert first.reserve(0) == 0.0
+    first.pause(30)
+    assert second.reserve(0) == pytest.approx(30.0)
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, None),
+    ({"retry-after": "2.5"}, 2.5),
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after-ms": "soon", "retry-after": "4"}, 4.0),
+    ({"retry-after": "inf"}, None),
+    ({"retry-after": "nan"}, None),
+    ({"retry-after": "not a date"}, None),
+    ({"retry-after": "Mon, 99 Foo 2024 99:99:99 GMT"}, None),
+])
+def test_retry_after_parsing(headers, expected):
+    assert retry_after(ProviderError(429, headers)) == expected
+
+def test_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert retry_after(ProviderError(429, {"retry-after": value})) == pytest.approx(60, abs=2)
+
+def scheduler(**kwargs):
+    return CallScheduler(RateLimiter(6000, 10**6), base_delay=0.0, **kwargs)
+
+def failing(errors, result="ok"):
+    """A call that raises each of ``errors`` in turn, then returns ``result``."""
+    errors, calls = list(errors), []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return fn, calls
+
+def test_retryable_errors_are_retried():
+    fn, calls = failing([ProviderError(503), TimeoutError()])
+    calls_scheduler = scheduler(max_retries=3)
+    assert calls_scheduler.call(fn) == "ok"
+    assert len(calls) == 3 and calls_scheduler.metrics["retries"] == 2
+
+def test_non_retryable_errors_are_raised_at_once():
+    fn, calls = failing([ProviderError(400)])
+    with pytest.raises(ProviderError):
+        scheduler().call(fn)
+    assert len(calls) == 1
+
+def test_retries_are_bounded():
+    fn, calls = failing([ProviderError(503)] * 5)
+    with pytest.raises(ProviderError):
+        scheduler(max_retries=2).call(fn)
+    assert len(calls) == 3
+
+def test_retry_after_pauses_the_limiter():
+    fn, _ = failing([ProviderError(429, {"retry-after": "0.05"})])
+    calls_scheduler = scheduler(max_retries=1)
+    assert calls_scheduler.call(fn) == "ok"
+    assert calls_scheduler.limiter.blocked_until > 0
+    assert calls_scheduler.metrics["rate_limited"] == 1
+
+def test_retry_after_is_honoured_when_giving_up():
+    fn, _ = failing([ProviderError(429, {"retry-after": "30"})])
+    calls_scheduler = scheduler(max_retries=0)
+    with pytest.raises(ProviderError):
+        calls_scheduler.call(fn)
+    assert calls_scheduler.limiter.reserve(0) == pytest.approx(30, abs=1)
+
+def test_async_retry():
+    fn, calls = failing([ProviderError(502)])
+
+    async def afn():
+        return fn()
+
+    assert asyncio.run(scheduler(max_retries=1).acall(afn)) == "ok"
+    assert len(calls) == 2
+
+def hedging_scheduler():
+    calls_scheduler = scheduler(hedge_percentile=0.5, hedge_min_samples=1)
+    calls_scheduler.latencies["other"] = [0.01]
+    return calls_scheduler
+
+def slow_then_fast():
+    started = []
+
+    async def afn():
+        started.append(1)
+        await asyncio.sleep(1.0 if len(started) == 1 else 0.0)
+        return len(started)
+
+    return afn, started
+
+def test_slow_call_is_hedged():
+    calls_scheduler = hedging_scheduler()
+    afn, started = slow_then_fast()
+    assert asyncio.run(calls_scheduler.acall(afn)) == 2
+    assert len(started) == 2
+    assert calls_scheduler.metrics["hedges"] == calls_scheduler.metrics["hedge_wins"] == 1
+
+def test_no_hedging_inside_streams():
+    calls_scheduler = hedging_scheduler()
+    afn, started = slow_then_fast()
+
+    async def main():
+        with no_hedging():
+            return await calls_scheduler.acall(afn)
+
+    assert asyncio.run(main()) == 1
+    assert len(started) == 1 and calls_scheduler.metrics["hedges"] == 0
+
+def test_call_that_cannot_meet_the_deadline_is_not_made():
+    calls_scheduler = CallScheduler(RateLimiter(requests_per_minute=1, tokens_per_minute=10**6))
+    fn, calls = failing([])
+    calls_scheduler.call(fn)
+    with deadline_scope(time.monotonic() + 1.0), pytest.raises(DeadlineExceeded):
+        calls_scheduler.call(fn)
+    assert len(calls) == 1